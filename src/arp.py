@@ -1,122 +1,303 @@
 # for managing a local arp cache
 
+import os
+import re
 import time
+import heapq
 import logging
 import subprocess
 import threading
 
-# TODO add some unit tests for parsing arp command output
+# hardware addresses may use single-digit octets (e.g. macOS arp output)
+MAC_ADDRESS = re.compile(r'^([0-9A-Fa-f]{1,2}[:-]){5}[0-9A-Fa-f]{1,2}$')
 
-################################################################################
-class ArpCache():
+# kernel neighbor entries without this flag are incomplete
+ATF_COM = 0x02
 
-    cmdLock = None
-    cacheLock = None
+#-------------------------------------------------------------------------------
+# convert a hardware address to a 48-bit integer; returns None if invalid
+def parseAddress(address):
+    if address is None: return None
 
-    cache = dict()
-    timeout = 0
+    octets = address.replace('-', ':').split(':')
+    if len(octets) != 6: return None
 
-    #---------------------------------------------------------------------------
-    def __init__(self, timeout=5):
-        self.logger = logging.getLogger('Plugin.arp.ArpCache')
-        self.timeout = timeout
+    value = 0
 
-        self.cmdLock = threading.Lock()
-        self.cacheLock = threading.RLock()
+    for octet in octets:
+        if len(octet) < 1 or len(octet) > 2: return None
+
+        try:
+            value = (value << 8) | int(octet, 16)
+        except ValueError:
+            return None
+
+    return value
+
+#-------------------------------------------------------------------------------
+# convert a 48-bit integer to the standard MM:MM:MM:SS:SS:SS format
+def formatAddress(value):
+    return ':'.join([ '%02X' % ((value >> shift) & 0xFF) for shift in range(40, -8, -8) ])
+
+#-------------------------------------------------------------------------------
+# parse a single line of 'arp -an' output; returns (ipaddr, hwaddr) or None
+#   macOS: ? (10.0.0.1) at 0:11:22:33:44:55 on en0 ifscope [ethernet]
+#   linux: ? (10.0.0.1) at 00:11:22:33:44:55 [ether] on eth0
+def parseArpCommandLine(line):
+    parts = line.split()
+
+    try:
+        idx = parts.index('at')
+    except ValueError:
+        return None
+
+    if idx < 1 or idx + 1 >= len(parts): return None
+
+    hwaddr = parts[idx+1]
+    if not MAC_ADDRESS.match(hwaddr): return None
+
+    ipaddr = parts[idx-1].strip('()')
+
+    return (ipaddr, hwaddr)
+
+#-------------------------------------------------------------------------------
+# parse a single line from /proc/net/arp; returns (ipaddr, hwaddr) or None
+#   IP address  HW type  Flags  HW address  Mask  Device
+def parseProcArpLine(line):
+    parts = line.split()
+    if len(parts) < 4: return None
+
+    try:
+        flags = int(parts[2], 16)
+    except ValueError:
+        return None
+
+    if not (flags & ATF_COM): return None
+
+    hwaddr = parts[3]
+    if not MAC_ADDRESS.match(hwaddr): return None
+
+    return (parts[0], hwaddr)
+
+################################################################################
+# reads the kernel neighbor table directly (Linux)
+class ProcArpTable():
 
     #---------------------------------------------------------------------------
-    def _normalizeAddress(self, address):
-        addr = address.upper()
-        octets = addr.split(':')
-        newOctets = []
-        for block in octets:
-            if len(block) < 2:
-                newOctets.append('0'+block)
-            else:
-                newOctets.append(block)
-        
-        normAddr = ':'.join([str(x) for x in newOctets])
-        # TODO make sure all octets are padded
-        # TODO return None for invalid address
+    def __init__(self, path='/proc/net/arp'):
+        self.logger = logging.getLogger('Plugin.arp.ProcArpTable')
+        self.path = path
 
-        return normAddr
+    #---------------------------------------------------------------------------
+    @staticmethod
+    def isSupported(path='/proc/net/arp'):
+        return os.access(path, os.R_OK)
 
     #---------------------------------------------------------------------------
-    def rebuildArpCache(self):
-        self.cacheLock.acquire()
+    # generates (ipaddr, hwaddr) for every complete neighbor entry
+    def getNeighbors(self):
+        try:
+            with open(self.path) as table:
+                # skip the header line
+                next(table, None)
 
-        self.updateCurrentDevices()
-        self.purgeInactiveDevices()
+                for line in table:
+                    entry = parseProcArpLine(line)
+                    if entry is not None: yield entry
 
-        self.cacheLock.release()
+        except IOError as e:
+            self.logger.warn(u'cannot read %s: %s', self.path, str(e))
+
+################################################################################
+# parses the output of the arp command; works where /proc is not available
+class ArpCommandTable():
 
     #---------------------------------------------------------------------------
-    def _getRawArpTable(self):
+    def __init__(self, cmd=('/usr/sbin/arp', '-an')):
+        self.logger = logging.getLogger('Plugin.arp.ArpCommandTable')
+
+        self.cmd = list(cmd)
+        self.cmdLock = threading.Lock()
+
+    #---------------------------------------------------------------------------
+    # generates (ipaddr, hwaddr) for every complete neighbor entry
+    def getNeighbors(self):
         # the command takes some time to run so we will bail if
         # another thread is already executing the arp command
         if not self.cmdLock.acquire(False):
-            self.logger.warn('/usr/sbin/arp: already in use')
-            return None
+            self.logger.warn(u'%s: already in use', self.cmd[0])
+            return
 
-        cmd = ['/usr/sbin/arp', '-a']
-        self.logger.debug('exec: %s', cmd)
+        self.logger.debug(u'exec: %s', self.cmd)
 
         try:
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            pout, perr = proc.communicate()
-        except:
-            pout = None
+            proc = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+            # process the output as it arrives rather than buffering it all
+            for line in iter(proc.stdout.readline, ''):
+                entry = parseArpCommandLine(line)
+                if entry is not None: yield entry
+
+            proc.stdout.close()
+            proc.stderr.close()
+            proc.wait()
+
+        except OSError as e:
+            self.logger.warn(u'%s: %s', self.cmd[0], str(e))
+
+        finally:
+            self.cmdLock.release()
+
+#-------------------------------------------------------------------------------
+# use the best neighbor table source available on this system
+def getDefaultSource():
+    if ProcArpTable.isSupported():
+        return ProcArpTable()
+
+    return ArpCommandTable()
 
-        self.cmdLock.release()
+################################################################################
+# hardware addresses are stored as integers and expire through a min-heap, so
+# lookups never reformat strings and a purge only touches expired entries
+#
+# the cache table is never modified once published; rebuilds work on a copy
+# and swap it in when complete, so readers never wait on or see a partial table
+class ArpCache():
+
+    rebuildLock = None
 
-        return pout
+    cache = None
+    timeout = 0
 
     #---------------------------------------------------------------------------
-    def updateCurrentDevices(self):
-        rawOutput = self._getRawArpTable()
+    def __init__(self, timeout=5, source=None):
+        self.logger = logging.getLogger('Plugin.arp.ArpCache')
+        self.timeout = timeout
 
-        self.cacheLock.acquire()
+        if source is None: source = getDefaultSource()
+        self.source = source
 
-        # translate command output to cache entries
-        for line in rawOutput.splitlines():
-            parts = line.split()
+        # last seen time for each address, with one (expiresAt, hwaddr)
+        # entry in the expiry heap for every address in the cache
+        self.cache = dict()
+        self.expiry = list()
 
-            addr = self._normalizeAddress(parts[3])
-            if addr is None: continue
+        # only held by writers; readers use whatever table is current
+        self.rebuildLock = threading.Lock()
 
-            self.cache[addr] = time.time()
-            self.logger.debug('device found: %s', addr)
+    #---------------------------------------------------------------------------
+    # the current table of hardware address to last seen time; do not modify
+    def getSnapshot(self):
+        return self.cache
 
-        self.cacheLock.release()
+    #---------------------------------------------------------------------------
+    def rebuildArpCache(self):
+        self._rebuild(update=True, purge=True)
+
+    #---------------------------------------------------------------------------
+    def updateCurrentDevices(self):
+        self._rebuild(update=True, purge=False)
 
     #---------------------------------------------------------------------------
     def purgeInactiveDevices(self):
-        toBePurged = list()
+        self._rebuild(update=False, purge=True)
+
+    #---------------------------------------------------------------------------
+    # record a sighting reported outside the normal rebuild (e.g. by the kernel);
+    # returns True if the address was not active before
+    def markSeen(self, address):
+        if not isinstance(address, (int, long)):
+            address = parseAddress(address)
 
-        self.cacheLock.acquire()
+        if address is None: return False
 
-        # first, find all the expired keys
-        for addr in self.cache.keys():
-            if not self.isActive(addr):
-                self.logger.debug('device expired: %s; marked for removal', addr)
-                toBePurged.append(addr)
+        with self.rebuildLock:
+            wasActive = self.isActive(address)
+            now = time.time()
 
-        # now, delete the expired addresses
-        for addr in toBePurged: del self.cache[addr]
+            # known addresses are updated in place, new ones need a new table
+            if address in self.cache:
+                self.cache[address] = now
+            else:
+                cache = dict(self.cache)
+                cache[address] = now
+                heapq.heappush(self.expiry, (now + self.timeout * 60, address))
+                self.cache = cache
 
-        self.cacheLock.release()
+        return not wasActive
 
     #---------------------------------------------------------------------------
-    def isActive(self, address):
-        addr = self._normalizeAddress(address)
+    def _rebuild(self, update, purge):
+        # a rebuild already in progress will publish a fresh table shortly
+        if not self.rebuildLock.acquire(False):
+            self.logger.debug(u'ARP cache rebuild already in progress')
+            return
 
-        last = self.cache.get(addr)
-        if last is None: return False
+        try:
+            cache = dict(self.cache)
+
+            if update: self._addCurrentDevices(cache)
+            if purge: self._purgeInactiveDevices(cache)
 
+            # publish the new table in a single assignment
+            self.cache = cache
+
+        finally:
+            self.rebuildLock.release()
+
+    #---------------------------------------------------------------------------
+    def _addCurrentDevices(self, cache):
+        ttl = self.timeout * 60
+
+        # translate neighbor entries to cache entries
+        for ipaddr, hwaddr in self.source.getNeighbors():
+            addr = parseAddress(hwaddr)
+            if addr is None: continue
+
+            now = time.time()
+
+            if addr not in cache:
+                heapq.heappush(self.expiry, (now + ttl, addr))
+                self.logger.debug('device found: %s [%s]', hwaddr, ipaddr)
+
+            cache[addr] = now
+
+    #---------------------------------------------------------------------------
+    def _purgeInactiveDevices(self, cache):
+        ttl = self.timeout * 60
         now = time.time()
-        diff = (now - last) / 60
 
-        self.logger.debug('device %s last activity was %d min ago', address, diff)
+        while len(self.expiry) > 0 and self.expiry[0][0] <= now:
+            expiresAt, addr = heapq.heappop(self.expiry)
+
+            last = cache.get(addr)
+            if last is None: continue
 
-        return (diff < self.timeout)
+            # devices seen since this entry was scheduled go back in the heap
+            if last + ttl > now:
+                heapq.heappush(self.expiry, (last + ttl, addr))
+            else:
+                self.logger.debug('device expired: %s', formatAddress(addr))
+                del cache[addr]
+
+    #---------------------------------------------------------------------------
+    # seconds since the address was last seen, or None if it is not in the cache
+    def getAge(self, address):
+        if not isinstance(address, (int, long)):
+            address = parseAddress(address)
+
+        last = self.cache.get(address)
+        if last is None: return None
+
+        return (time.time() - last)
+
+    #---------------------------------------------------------------------------
+    # address may be a string or an integer from parseAddress
+    def isActive(self, address):
+        if not isinstance(address, (int, long)):
+            address = parseAddress(address)
+
+        last = self.cache.get(address)
+        if last is None: return False
 
+        return ((time.time() - last) < self.timeout * 60)
@@ -1,39 +1,81 @@
 ## handle client activities for Network Devices
 
+import os
+import re
+import time
 import logging
 import shlex
 import socket
-import urllib2
+import hashlib
+import tempfile
 import threading
 import subprocess
 
+import arp
+import httppool
+import supervisor
+
+# round trip time from ping output, e.g. "time=0.045 ms"
+PING_TIME = re.compile(r'time[=<]\s*([0-9.]+)\s*ms')
+
 ################################################################################
 class ClientBase():
 
+    # probe results shared by clients that check the same target (see probecache)
+    probeCache = None
+
     #---------------------------------------------------------------------------
     def __init__(self):
         self.logger = logging.getLogger('Plugin.client.ClientBase')
         self.execLock = threading.Lock()
 
+        # commands run under the shared supervisor; None uses its default timeout
+        self.supervisor = supervisor.defaultSupervisor
+        self.execTimeout = None
+        self.lastResult = None
+
+        # timing (in seconds) of the last check, if the client can measure it
+        self.latency = None
+
+    #---------------------------------------------------------------------------
+    # returns (available, latency) for a single check
+    def probe(self):
+        key = self.getProbeKey() if self.probeCache is not None else None
+        if key is None: return self._probe()
+
+        available, self.latency = self.probeCache.get(key, self._probe)
+        return (available, self.latency)
+
+    #---------------------------------------------------------------------------
+    # identifies what this client checks, so identical probes can be shared;
+    # None means the result is specific to this client
+    def getProbeKey(self):
+        return None
+
+    #---------------------------------------------------------------------------
+    def _probe(self):
+        self.latency = None
+        available = self.isAvailable()
+        return (available, self.latency)
+
     #---------------------------------------------------------------------------
     # defined here as a convenience to subclasses
     def _exec(self, *cmd):
         self.execLock.acquire()
         self.logger.debug(u'=> exec%s', cmd)
 
-        retval = -1
+        result = self.supervisor.run(cmd, self.execTimeout)
+        self.lastResult = result
 
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        pout, perr = proc.communicate()
+        self.logger.debug(u'=> exit(%s)', result.returncode)
 
-        retval = proc.returncode
-        self.logger.debug(u'=> exit(%d)', retval)
+        if result.isSuccess(): self.latency = result.elapsed
 
-        # TODO check perr
-        #self.logger.warn(perr)
+        if not result.isSuccess() and len(result.stderr) > 0:
+            self.logger.debug(u'=> %s', result.stderr.strip())
 
         self.execLock.release()
-        return (retval == 0)
+        return result.isSuccess()
 
 ################################################################################
 class NullClient(ClientBase):
@@ -56,6 +98,10 @@ class LocalCommand(ClientBase):
 
         self.statusCommand = statusCommand
 
+    #---------------------------------------------------------------------------
+    def getProbeKey(self):
+        return ('exec', self.statusCommand)
+
     #---------------------------------------------------------------------------
     def isAvailable(self):
         statusCmd = self.statusCommand
@@ -71,23 +117,38 @@ class LocalCommand(ClientBase):
 class ServiceClient(ClientBase):
 
     #---------------------------------------------------------------------------
-    def __init__(self, address, port):
+    def __init__(self, address, port, prober=None):
         ClientBase.__init__(self)
         self.logger = logging.getLogger('Plugin.client.ServiceClient')
 
         self.address = address
         self.port = port
+        self.prober = prober
+
+    #---------------------------------------------------------------------------
+    def getProbeKey(self):
+        return ('tcp', self.address, self.port)
 
     #---------------------------------------------------------------------------
     # determine if the specific host is reachable
     def isAvailable(self):
+
+        # prefer results from the shared prober when they are available
+        if self.prober is not None:
+            available = self.prober.getResult(self.address, self.port)
+            if available is not None:
+                self.latency = self.prober.getConnectTime(self.address, self.port)
+                return available
+
         self.logger.debug('checking host - %s:%d', self.address, self.port)
 
         ret = True
 
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            started = time.time()
             sock.connect( (self.address, self.port) )
+            self.latency = time.time() - started
             sock.close()
         except:
             ret = False
@@ -97,31 +158,64 @@ class ServiceClient(ClientBase):
 ################################################################################
 class PingClient(ClientBase):
 
+    pingCommand = '/sbin/ping'
+
     #---------------------------------------------------------------------------
-    def __init__(self, address):
+    def __init__(self, address, sweeper=None):
         ClientBase.__init__(self)
         self.logger = logging.getLogger('Plugin.client.PingClient')
         self.address = address
+        self.sweeper = sweeper
+
+    #---------------------------------------------------------------------------
+    def getProbeKey(self):
+        return ('ping', self.address)
 
     #---------------------------------------------------------------------------
     # determine if the specific host is reachable
     def isAvailable(self):
+
+        # prefer results from the shared sweeper when they are available
+        if self.sweeper is not None:
+            available = self.sweeper.getResult(self.address)
+            if available is not None:
+                self.latency = self.sweeper.getRoundTripTime(self.address)
+                return available
+
         self.logger.debug('pinging address - %s', self.address)
 
         # we will only wait for 1 ping response
-        cmd = ['/sbin/ping', '-c1', self.address]
+        cmd = [self.pingCommand, '-c1', self.address]
 
-        return self._exec(*cmd)
+        available = self._exec(*cmd)
+
+        # report the round trip time rather than the time to run ping
+        if available:
+            match = PING_TIME.search(self.lastResult.stdout)
+            if match: self.latency = float(match.group(1)) / 1000
+
+        return available
 
 ################################################################################
 class HttpClient(ClientBase):
 
     #---------------------------------------------------------------------------
-    def __init__(self, url):
+    def __init__(self, url, pool=None, method='GET', maxRedirects=5):
         ClientBase.__init__(self)
         self.logger = logging.getLogger('Plugin.client.HttpClient')
         self.url = url
 
+        # connections are shared by all clients using the same pool
+        if pool is None: pool = httppool.HttpConnectionPool()
+        self.pool = pool
+
+        self.method = method
+        self.maxRedirects = maxRedirects
+
+    #---------------------------------------------------------------------------
+    def getProbeKey(self):
+        return ('http', self.method, self.url, self.maxRedirects)
+
     #---------------------------------------------------------------------------
     # determine if the returned status code is success or error
     def isAvailable(self):
@@ -129,14 +223,11 @@ class HttpClient(ClientBase):
         available = None
 
         try:
-            resp = urllib2.urlopen(self.url)
-            status = resp.getcode()
+            status, self.latency = self.pool.requestTimed(self.method, self.url, self.maxRedirects)
 
             self.logger.debug('HTTP status - %d', status)
             available = (200 <= status <= 299)
 
-            # XXX how are redirects handled?
-
         except Exception as e:
             self.logger.warn(str(e))
             available = False
@@ -158,11 +249,19 @@ class ArpClient(ClientBase):
         self.address = address
         self.arpTable = arpTable
 
+        # parse the address once rather than on every lookup
+        self.hwaddr = arp.parseAddress(address)
+
     #---------------------------------------------------------------------------
     # check for the device in the current ARP table
     def isAvailable(self):
         self.logger.debug('checking ARP table for device - %s', self.address)
-        return self.arpTable.isActive(self.address)
+        if self.hwaddr is None: return False
+
+        # for local devices, timing is how long ago the device was last seen
+        self.latency = self.arpTable.getAge(self.hwaddr)
+
+        return self.arpTable.isActive(self.hwaddr)
 
 ################################################################################
 class SSHClient(ServiceClient):
@@ -172,15 +271,33 @@ class SSHClient(ServiceClient):
     # - status : determine if the system is available
     # - shutdown : shut the system down; halt; power off
 
+    sshCommand = '/usr/bin/ssh'
+
+    # master connections shared by clients for the same host / user / port,
+    # keyed by control path: [ process, refcount ]
+    masters = dict()
+    masterLock = threading.Lock()
+
     #---------------------------------------------------------------------------
-    def __init__(self, address, port=22, username=None, password=None):
-        ServiceClient.__init__(self, address, port)
+    def __init__(self, address, port=22, username=None, password=None, prober=None,
+                 multiplex=True):
+        ServiceClient.__init__(self, address, port, prober)
         self.logger = logging.getLogger('Plugin.client.SSHClient')
 
         self.commands = dict()
         self.username = username
         self.password = password
 
+        self.controlPath = None
+        if multiplex: self._attachMaster()
+
+    #---------------------------------------------------------------------------
+    def getProbeKey(self):
+        statusCmd = self.commands.get('status', None)
+        if statusCmd is None: return ServiceClient.getProbeKey(self)
+
+        return ('ssh', self.address, self.port, self.username, statusCmd)
+
     #---------------------------------------------------------------------------
     def isAvailable(self):
         statusCmd = self.commands.get('status', None)
@@ -188,9 +305,15 @@ class SSHClient(ServiceClient):
 
         if statusCmd is None:
             return ServiceClient.isAvailable(self)
-        else:
-            cmd = shlex.split(statusCmd)
-            return self._rexec(*cmd)
+
+        # don't bother with ssh if the prober already knows the port is closed
+        if self.prober is not None:
+            if self.prober.getResult(self.address, self.port) is False:
+                self.logger.debug(u'ssh port is not responding')
+                return False
+
+        cmd = shlex.split(statusCmd)
+        return self._rexec(*cmd)
 
     #---------------------------------------------------------------------------
     def turnOff(self):
@@ -205,28 +328,134 @@ class SSHClient(ServiceClient):
         return status
 
     #---------------------------------------------------------------------------
-    def _rexec(self, *cmd):
-        # setup the remote command using a safe ssh config
-        # XXX -f would be ideal, but we lose the return code of the remote command
-        rcmd = ['/usr/bin/ssh', '-anTxq']
+    # release the shared master connection; the last client to close reaps it
+    def close(self):
+        path = self.controlPath
+        if path is None: return
+
+        self.controlPath = None
+
+        with self.masterLock:
+            master = self.masters.get(path)
+            if master is None: return
+
+            master[1] -= 1
+            if master[1] > 0: return
+
+            del self.masters[path]
+            proc = master[0]
+
+        if proc is not None and proc.poll() is None:
+            self.logger.debug(u'closing master connection: %s', path)
+            proc.terminate()
+            proc.wait()
+
+        self._removeControlPath(path)
+
+    #---------------------------------------------------------------------------
+    def _getControlPath(self):
+        ident = '%s@%s:%d' % (self.username or '', self.address, self.port)
+        digest = hashlib.sha1(ident.encode('utf-8')).hexdigest()[:16]
+
+        # keep this short; unix socket paths are limited to ~100 characters
+        return os.path.join(tempfile.gettempdir(), 'netdev-ssh-%s' % digest)
+
+    #---------------------------------------------------------------------------
+    def _removeControlPath(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    #---------------------------------------------------------------------------
+    def _attachMaster(self):
+        path = self._getControlPath()
+
+        with self.masterLock:
+            master = self.masters.setdefault(path, [ None, 0 ])
+            master[1] += 1
+
+        self.controlPath = path
+
+    #---------------------------------------------------------------------------
+    # make sure a master connection is running for this host; the process is
+    # owned by the plugin so it can be reaped when devices stop
+    def _startMaster(self):
+        path = self.controlPath
+
+        with self.masterLock:
+            master = self.masters.get(path)
+            if master is None: return
 
-        # TODO support global timeout, e.g.
-        #rcmd.append('-o', 'ConnectTimeout=%d' % connectionTimeout)
+            proc = master[0]
+            if proc is not None and proc.poll() is None: return
+
+            # a stale socket would keep the new master from listening
+            self._removeControlPath(path)
+
+            mcmd = [ self.sshCommand, '-MNnTxq' ]
+            mcmd.extend(self._getOptions())
+            mcmd.extend(('-o', 'ControlMaster=yes', '-o', 'ControlPath=%s' % path))
+            mcmd.extend(('-o', 'ServerAliveInterval=30', '-o', 'ServerAliveCountMax=3'))
+            mcmd.extend(self._getHostArgs())
+
+            self.logger.debug(u'starting master connection: %s', path)
+
+            # the master runs until closed, so it must not hold any of our pipes
+            with open(os.devnull, 'r+') as devnull:
+                try:
+                    master[0] = subprocess.Popen(mcmd, stdin=devnull, stdout=devnull,
+                                                 stderr=devnull, close_fds=True)
+                except OSError as e:
+                    self.logger.warn(u'could not start ssh master: %s', str(e))
+
+    #---------------------------------------------------------------------------
+    def _getOptions(self):
+        # never prompt for passwords; SSH devices must use keys
+        opts = [ '-o', 'BatchMode=yes' ]
+
+        timeout = socket.getdefaulttimeout()
+        if timeout is not None and timeout > 0:
+            opts.extend(('-o', 'ConnectTimeout=%d' % max(1, int(timeout))))
+
+        return opts
+
+    #---------------------------------------------------------------------------
+    def _getHostArgs(self):
+        args = list()
 
         # username is optional for SSH commands...
         username = self.username
         if username is not None and len(username) > 0:
-            self.logger.debug(u'running as remote user: %s', username)
-            rcmd.extend(('-l', username))
+            args.extend(('-l', username))
+
+        # add the host and port
+        args.extend(('-p', str(self.port), self.address))
+
+        return args
+
+    #---------------------------------------------------------------------------
+    def _rexec(self, *cmd):
+        # setup the remote command using a safe ssh config
+        # XXX -f would be ideal, but we lose the return code of the remote command
+        rcmd = [self.sshCommand, '-anTxq']
+        rcmd.extend(self._getOptions())
+
+        # use the shared master connection when it is up; otherwise ssh will
+        # connect directly while the master is (re)established
+        if self.controlPath is not None:
+            self._startMaster()
+            rcmd.extend(('-o', 'ControlMaster=no', '-o', 'ControlPath=%s' % self.controlPath))
+
+        if self.username is not None and len(self.username) > 0:
+            self.logger.debug(u'running as remote user: %s', self.username)
         else:
             # TODO capture local username in debug log
             self.logger.debug(u'running as local user')
 
-        # add the host and port
-        rcmd.extend(('-p', str(self.port), self.address))
+        rcmd.extend(self._getHostArgs())
 
         # add all commands supplied by caller
         rcmd.extend(cmd)
 
         return self._exec(*rcmd)
-
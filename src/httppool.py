@@ -0,0 +1,184 @@
+## persistent HTTP connections for Network Devices
+
+import ssl
+import time
+import select
+import socket
+import httplib
+import logging
+import urlparse
+import threading
+
+# status codes that carry a new location for the request
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+# response bodies larger than this are not worth draining to reuse a connection
+MAX_DRAIN_BYTES = 65536
+
+################################################################################
+# keeps idle HTTP/1.1 connections open per host so repeated requests skip the
+# TCP (and TLS) handshake
+class HttpConnectionPool():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, timeout=5, maxIdle=4, idleTimeout=300, sslContext=None):
+        self.logger = logging.getLogger('Plugin.httppool.HttpConnectionPool')
+
+        self.timeout = timeout
+        self.maxIdle = maxIdle
+        self.idleTimeout = idleTimeout
+
+        # a single context lets connections to the same host share TLS settings
+        if sslContext is None: sslContext = ssl.create_default_context()
+        self.sslContext = sslContext
+
+        self.idle = dict()
+        self.lock = threading.Lock()
+
+        self.connectCount = 0
+
+    #---------------------------------------------------------------------------
+    def _connect(self, scheme, host, port):
+        timeout = self.timeout if self.timeout > 0 else None
+
+        self.logger.debug(u'opening connection: %s://%s:%d', scheme, host, port)
+        self.connectCount += 1
+
+        if scheme == 'https':
+            return httplib.HTTPSConnection(host, port, timeout=timeout, context=self.sslContext)
+
+        return httplib.HTTPConnection(host, port, timeout=timeout)
+
+    #---------------------------------------------------------------------------
+    # an idle connection that the server has closed will be readable (EOF)
+    def _isStale(self, conn, lastUsed):
+        if conn.sock is None: return True
+        if time.time() - lastUsed > self.idleTimeout: return True
+
+        try:
+            readable, _, _ = select.select([conn.sock], [ ], [ ], 0)
+        except (select.error, socket.error):
+            return True
+
+        return (len(readable) > 0)
+
+    #---------------------------------------------------------------------------
+    # returns (conn, reused) for the given host
+    def _getConnection(self, key):
+        with self.lock:
+            idle = self.idle.get(key, [ ])
+
+            while len(idle) > 0:
+                conn, lastUsed = idle.pop()
+
+                if not self._isStale(conn, lastUsed):
+                    return (conn, True)
+
+                conn.close()
+
+        return (self._connect(*key), False)
+
+    #---------------------------------------------------------------------------
+    def _putConnection(self, key, conn):
+        with self.lock:
+            idle = self.idle.setdefault(key, list())
+
+            if len(idle) < self.maxIdle:
+                idle.append((conn, time.time()))
+            else:
+                conn.close()
+
+    #---------------------------------------------------------------------------
+    def close(self):
+        with self.lock:
+            for idle in self.idle.values():
+                for conn, lastUsed in idle: conn.close()
+
+            self.idle.clear()
+
+    #---------------------------------------------------------------------------
+    # perform the request, following up to maxRedirects; returns the final status
+    def request(self, method, url, maxRedirects=5):
+        status, ttfb = self.requestTimed(method, url, maxRedirects)
+        return status
+
+    #---------------------------------------------------------------------------
+    # returns (status, ttfb) where ttfb is the time (in seconds) from sending
+    # the final request to receiving its response headers
+    def requestTimed(self, method, url, maxRedirects=5):
+        for attempt in range(maxRedirects + 1):
+            status, location, ttfb = self._request(method, url)
+
+            if status not in REDIRECT_CODES or location is None:
+                return (status, ttfb)
+
+            url = urlparse.urljoin(url, location)
+            self.logger.debug(u'HTTP redirect (%d) - %s', status, url)
+
+            if status == 303: method = 'GET'
+
+        raise httplib.HTTPException('too many redirects')
+
+    #---------------------------------------------------------------------------
+    # returns (status, location, ttfb) for a single request
+    def _request(self, method, url):
+        parts = urlparse.urlsplit(url)
+
+        scheme = parts.scheme.lower()
+        if scheme not in ('http', 'https'):
+            raise httplib.HTTPException('unsupported URL: %s' % url)
+
+        port = parts.port
+        if port is None: port = (443 if scheme == 'https' else 80)
+
+        key = (scheme, parts.hostname, port)
+
+        path = parts.path or '/'
+        if parts.query: path += '?' + parts.query
+
+        conn, reused = self._getConnection(key)
+        started = time.time()
+
+        try:
+            resp = self._send(conn, method, path)
+        except (httplib.HTTPException, socket.error):
+            conn.close()
+
+            # the server may have dropped a kept-alive connection; try once more
+            if not reused: raise
+
+            conn = self._connect(*key)
+            started = time.time()
+            resp = self._send(conn, method, path)
+
+        ttfb = time.time() - started
+
+        status = resp.status
+        location = resp.getheader('location')
+
+        if self._finishResponse(resp):
+            self._putConnection(key, conn)
+        else:
+            conn.close()
+
+        return (status, location, ttfb)
+
+    #---------------------------------------------------------------------------
+    def _send(self, conn, method, path):
+        conn.request(method, path)
+        return conn.getresponse()
+
+    #---------------------------------------------------------------------------
+    # drain the response so the connection can be reused; returns False if it can't
+    def _finishResponse(self, resp):
+        if resp.will_close:
+            resp.read()
+            return False
+
+        if resp.length is not None and resp.length > MAX_DRAIN_BYTES:
+            return False
+
+        body = resp.read(MAX_DRAIN_BYTES + 1)
+        if len(body) > MAX_DRAIN_BYTES: return False
+
+        return resp.isclosed()
@@ -0,0 +1,236 @@
+## batched ICMP echo support for Network Devices
+
+import os
+import time
+import errno
+import select
+import socket
+import struct
+import logging
+import threading
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+# marks packets sent by this plugin
+ICMP_PAYLOAD = 'indigo-netdev'
+
+#-------------------------------------------------------------------------------
+# standard internet checksum (RFC 1071)
+def checksum(data):
+    if len(data) % 2: data += '\0'
+
+    total = 0
+    for idx in range(0, len(data), 2):
+        total += (ord(data[idx]) << 8) + ord(data[idx+1])
+
+    total = (total >> 16) + (total & 0xFFFF)
+    total += (total >> 16)
+
+    return ~total & 0xFFFF
+
+#-------------------------------------------------------------------------------
+def buildEchoRequest(ident, sequence):
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, sequence)
+    csum = checksum(header + ICMP_PAYLOAD)
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, csum, ident, sequence)
+    return header + ICMP_PAYLOAD
+
+#-------------------------------------------------------------------------------
+# returns (ident, sequence) for echo replies or None for anything else
+def parseEchoReply(data):
+    if len(data) < 8: return None
+
+    # some platforms (e.g. macOS) include the IP header on datagram sockets
+    if (ord(data[0]) >> 4) == 4:
+        headerLen = (ord(data[0]) & 0x0F) * 4
+        data = data[headerLen:]
+        if len(data) < 8: return None
+
+    icmpType, code, csum, ident, sequence = struct.unpack('!BBHHH', data[:8])
+    if icmpType != ICMP_ECHO_REPLY: return None
+
+    return (ident, sequence)
+
+################################################################################
+# sends echo requests to all registered targets in a single burst
+class IcmpSweeper():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, timeout=5):
+        self.logger = logging.getLogger('Plugin.icmp.IcmpSweeper')
+
+        self.timeout = timeout
+        self.supported = True
+
+        self.ident = os.getpid() & 0xFFFF
+        self.sequence = 0
+
+        self.targets = dict()
+        self.results = dict()
+
+        self.targetLock = threading.Lock()
+        self.sweepLock = threading.Lock()
+
+    #---------------------------------------------------------------------------
+    def register(self, address):
+        with self.targetLock:
+            self.targets[address] = self.targets.get(address, 0) + 1
+
+    #---------------------------------------------------------------------------
+    def unregister(self, address):
+        with self.targetLock:
+            count = self.targets.get(address, 0) - 1
+
+            if count > 0:
+                self.targets[address] = count
+            else:
+                self.targets.pop(address, None)
+                self.results.pop(address, None)
+
+    #---------------------------------------------------------------------------
+    # True / False from the last sweep or None if the address has not been swept
+    def getResult(self, address):
+        if address not in self.results: return None
+        return (self.results[address] is not None)
+
+    #---------------------------------------------------------------------------
+    # round trip time (in seconds) from the last sweep or None
+    def getRoundTripTime(self, address):
+        return self.results.get(address, None)
+
+    #---------------------------------------------------------------------------
+    def _openSocket(self):
+        proto = socket.getprotobyname('icmp')
+
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, proto)
+        except socket.error as e:
+            self.logger.warn(u'ICMP sockets not available (%s); using ping command', str(e))
+            self.supported = False
+            return None
+
+        sock.setblocking(False)
+        return sock
+
+    #---------------------------------------------------------------------------
+    def _resolveTargets(self, addresses):
+        hosts = dict()
+
+        for address in addresses:
+            try:
+                host = socket.gethostbyname(address)
+            except socket.error as e:
+                self.logger.debug(u'cannot resolve %s: %s', address, str(e))
+                continue
+
+            hosts.setdefault(host, list()).append(address)
+
+        return hosts
+
+    #---------------------------------------------------------------------------
+    # probe the given (or all registered) targets; returns the number of responses
+    def sweep(self, targets=None):
+        if not self.supported: return 0
+
+        if targets is not None:
+            addresses = list(set(targets))
+        else:
+            with self.targetLock:
+                addresses = self.targets.keys()
+
+        if len(addresses) == 0: return 0
+
+        with self.sweepLock:
+            results = self._sweep(addresses)
+
+        if results is None: return 0
+
+        self.results.update(results)
+
+        alive = len([ rtt for rtt in results.values() if rtt is not None ])
+        self.logger.debug(u'ICMP sweep: %d of %d targets responded', alive, len(addresses))
+
+        return alive
+
+    #---------------------------------------------------------------------------
+    def _sweep(self, addresses):
+        sock = self._openSocket()
+        if sock is None: return None
+
+        results = dict.fromkeys(addresses)
+        hosts = self._resolveTargets(addresses)
+
+        pending = dict()
+        idents = None
+
+        # leave room for a full burst of replies
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, max(262144, len(hosts) * 1024))
+        except socket.error:
+            pass
+
+        try:
+            # send the full burst of requests
+            for host in hosts:
+                self.sequence = (self.sequence + 1) & 0xFFFF
+                packet = buildEchoRequest(self.ident, self.sequence)
+
+                try:
+                    sock.sendto(packet, (host, 0))
+                    pending[self.sequence] = (host, time.time())
+                except socket.error as e:
+                    self.logger.debug(u'ICMP send failed: %s - %s', host, str(e))
+                    continue
+
+                # the kernel may replace our identifier with the local port
+                if idents is None: idents = (self.ident, sock.getsockname()[1])
+
+                # pick up early replies as we go so they don't pile up
+                self._readReplies(sock, idents, pending, hosts, results)
+
+            timeout = self.timeout if self.timeout > 0 else 1
+            deadline = time.time() + timeout
+
+            while len(pending) > 0:
+                remaining = deadline - time.time()
+                if remaining <= 0: break
+
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if len(readable) == 0: break
+
+                self._readReplies(sock, idents, pending, hosts, results)
+
+        finally:
+            sock.close()
+
+        return results
+
+    #---------------------------------------------------------------------------
+    def _readReplies(self, sock, idents, pending, hosts, results):
+        while True:
+            try:
+                data, source = sock.recvfrom(1024)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK): break
+                raise
+
+            now = time.time()
+
+            reply = parseEchoReply(data)
+            if reply is None: continue
+
+            ident, sequence = reply
+            if ident not in idents: continue
+
+            request = pending.get(sequence)
+            if request is None: continue
+
+            # the reply must come from the host we sent the request to
+            host, sentAt = request
+            if source[0] != host: continue
+
+            del pending[sequence]
+
+            for address in hosts[host]:
+                results[address] = now - sentAt
@@ -0,0 +1,48 @@
+## probe metrics for Network Devices
+
+import math
+import array
+
+################################################################################
+# keeps the most recent samples in a fixed-size ring for rolling statistics
+class RollingWindow():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, size=100):
+        self.size = size
+        self.samples = array.array('d', [ 0.0 ] * size)
+
+        self.count = 0
+        self.next = 0
+        self.total = 0.0
+
+        self.last = None
+
+    #---------------------------------------------------------------------------
+    def add(self, value):
+        # replace the oldest sample once the window is full
+        if self.count == self.size:
+            self.total -= self.samples[self.next]
+        else:
+            self.count += 1
+
+        self.samples[self.next] = value
+        self.total += value
+
+        self.next = (self.next + 1) % self.size
+        self.last = value
+
+    #---------------------------------------------------------------------------
+    def getAverage(self):
+        if self.count == 0: return None
+        return self.total / self.count
+
+    #---------------------------------------------------------------------------
+    # nearest-rank percentile (0-100) of the samples in the window
+    def getPercentile(self, pct):
+        if self.count == 0: return None
+
+        values = sorted(self.samples[:self.count])
+        rank = int(math.ceil(pct / 100.0 * self.count)) - 1
+
+        return values[min(max(rank, 0), self.count - 1)]
@@ -0,0 +1,187 @@
+## kernel neighbor table notifications for Network Devices (Linux only)
+
+import errno
+import socket
+import struct
+import select
+import logging
+import threading
+
+import arp
+
+NETLINK_ROUTE = 0
+
+# multicast group for neighbor table changes
+RTMGRP_NEIGH = 0x04
+
+RTM_NEWNEIGH = 28
+RTM_DELNEIGH = 29
+
+NDA_DST = 1
+NDA_LLADDR = 2
+
+# neighbor states (NUD_*) from linux/neighbour.h
+NUD_INCOMPLETE = 0x01
+NUD_REACHABLE = 0x02
+NUD_STALE = 0x04
+NUD_DELAY = 0x08
+NUD_PROBE = 0x10
+NUD_FAILED = 0x20
+NUD_NOARP = 0x40
+NUD_PERMANENT = 0x80
+
+# struct nlmsghdr, struct ndmsg and struct rtattr
+NLMSG_HEADER = struct.Struct('=LHHLL')
+ND_MESSAGE = struct.Struct('=BxxxiHBB')
+RT_ATTRIBUTE = struct.Struct('=HH')
+
+#-------------------------------------------------------------------------------
+# netlink messages and attributes are padded to 4 bytes
+def align(length):
+    return (length + 3) & ~3
+
+#-------------------------------------------------------------------------------
+# returns a dict of attribute type to raw value
+def parseAttributes(data, offset, end):
+    attrs = dict()
+
+    while offset + RT_ATTRIBUTE.size <= end:
+        length, attrType = RT_ATTRIBUTE.unpack_from(data, offset)
+        if length < RT_ATTRIBUTE.size: break
+
+        attrs[attrType] = data[offset+RT_ATTRIBUTE.size:offset+length]
+        offset += align(length)
+
+    return attrs
+
+#-------------------------------------------------------------------------------
+# yields (msgType, state, ipaddr, hwaddr) for each neighbor message in data;
+# ipaddr and hwaddr are None if the message does not include them
+def parseNeighborMessages(data):
+    offset = 0
+
+    while offset + NLMSG_HEADER.size <= len(data):
+        length, msgType, flags, seq, pid = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NLMSG_HEADER.size or offset + length > len(data): break
+
+        body = offset + NLMSG_HEADER.size
+
+        if msgType in (RTM_NEWNEIGH, RTM_DELNEIGH) and body + ND_MESSAGE.size <= offset + length:
+            family, ifindex, state, ndflags, ndtype = ND_MESSAGE.unpack_from(data, body)
+            attrs = parseAttributes(data, body + ND_MESSAGE.size, offset + length)
+
+            ipaddr = attrs.get(NDA_DST)
+            if ipaddr is not None:
+                try:
+                    ipaddr = socket.inet_ntop(family, ipaddr)
+                except (ValueError, socket.error):
+                    ipaddr = None
+
+            hwaddr = attrs.get(NDA_LLADDR)
+            if hwaddr is not None and len(hwaddr) == 6:
+                hwaddr = ':'.join([ '%02x' % ord(octet) for octet in hwaddr ])
+            else:
+                hwaddr = None
+
+            yield (msgType, state, ipaddr, hwaddr)
+
+        offset += align(length)
+
+################################################################################
+# listens for changes to the kernel neighbor table and feeds them to the ARP
+# cache as they happen, rather than waiting for the next rebuild; the callback
+# is given the hardware address (as an integer) of devices that just showed up
+class NeighborListener():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, arpCache, callback=None):
+        self.logger = logging.getLogger('Plugin.netlink.NeighborListener')
+
+        self.arpCache = arpCache
+        self.callback = callback
+
+        self.sock = None
+        self.thread = None
+        self.running = False
+
+        self.events = 0
+
+    #---------------------------------------------------------------------------
+    @staticmethod
+    def isSupported():
+        return hasattr(socket, 'AF_NETLINK')
+
+    #---------------------------------------------------------------------------
+    # returns False if the listener could not be started
+    def start(self):
+        if self.running: return True
+
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_NEIGH))
+        except (AttributeError, socket.error) as e:
+            self.logger.debug(u'neighbor notifications not available: %s', str(e))
+            return False
+
+        self.sock = sock
+        self.running = True
+
+        self.thread = threading.Thread(target=self._run, name='NeighborListener')
+        self.thread.daemon = True
+        self.thread.start()
+
+        return True
+
+    #---------------------------------------------------------------------------
+    def stop(self):
+        self.running = False
+
+        if self.thread is not None:
+            self.thread.join(5)
+            self.thread = None
+
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    #---------------------------------------------------------------------------
+    def _run(self):
+        self.logger.debug(u'listening for neighbor table changes')
+
+        while self.running:
+            try:
+                readable = select.select([ self.sock ], [ ], [ ], 1.0)[0]
+                if len(readable) == 0: continue
+
+                data = self.sock.recv(65536)
+
+            except socket.error as e:
+                # dropped messages are picked up by the next rebuild
+                if e.args[0] in (errno.ENOBUFS, errno.EINTR): continue
+
+                self.logger.warn(u'neighbor listener stopped: %s', str(e))
+                break
+
+            try:
+                for msgType, state, ipaddr, hwaddr in parseNeighborMessages(data):
+                    self._handleMessage(msgType, state, ipaddr, hwaddr)
+            except Exception as e:
+                self.logger.error(u'neighbor update failed: %s', str(e))
+
+        self.running = False
+
+    #---------------------------------------------------------------------------
+    def _handleMessage(self, msgType, state, ipaddr, hwaddr):
+        self.events += 1
+
+        # only a confirmed entry says the device is there now; stale and failed
+        # entries are left to age out of the cache on the normal timeout
+        if msgType != RTM_NEWNEIGH or not (state & NUD_REACHABLE): return
+        if hwaddr is None: return
+
+        addr = arp.parseAddress(hwaddr)
+        if addr is None: return
+
+        if self.arpCache.markSeen(addr):
+            self.logger.debug(u'device arrived: %s [%s]', hwaddr, ipaddr)
+            if self.callback is not None: self.callback(addr)
@@ -1,18 +1,45 @@
 ## Indigo plugin for monitoring network devices
 
+import random
 import logging
 import socket
 
 import iplug
 import arp
+import icmp
+import netlink
+import tcp
+import httppool
 import wrapper
 import clients
+import poller
+import probecache
+import scheduler
+import supervisor
 
 ################################################################################
 class Plugin(iplug.ThreadedPlugin):
 
     wrappers = dict()
+    local_devices = dict()
     arp_cache = None
+    neighbor_listener = None
+    icmp_sweeper = None
+    tcp_prober = None
+    http_pool = None
+    probe_cache = None
+    poller = None
+    scheduler = None
+
+    refreshInterval = 60
+    heartbeatInterval = 300
+
+    # initial checks are spread over this many seconds after startup
+    warmupPeriod = 15
+    warmupTiers = 3
+
+    # scheduler key for rebuilding the ARP cache
+    ARP_REBUILD = 'arp'
 
     #---------------------------------------------------------------------------
     def validatePrefsConfigUi(self, values):
@@ -21,6 +48,9 @@ class Plugin(iplug.ThreadedPlugin):
         iplug.validateConfig_Int('threadLoopDelay', values, errors, min=60, max=3600)
         iplug.validateConfig_Int('connectionTimeout', values, errors, min=0, max=300)
         iplug.validateConfig_Int('arpCacheTimeout', values, errors, min=1, max=1440)
+        iplug.validateConfig_Int('maxConcurrentProbes', values, errors, min=1, max=256)
+        iplug.validateConfig_Int('heartbeatInterval', values, errors, min=0, max=86400)
+        iplug.validateConfig_Int('commandTimeout', values, errors, min=1, max=600)
 
         return ((len(errors) == 0), values, errors)
 
@@ -51,32 +81,55 @@ class Plugin(iplug.ThreadedPlugin):
         wrap = None
 
         if typeId == 'service':
-            wrap = wrapper.Service(device)
+            wrap = wrapper.Service(device, self.tcp_prober)
         elif typeId == 'ping':
-            wrap = wrapper.Ping(device)
+            wrap = wrapper.Ping(device, self.icmp_sweeper)
         elif typeId == 'http':
-            wrap = wrapper.HTTP(device)
+            wrap = wrapper.HTTP(device, self.http_pool)
         elif typeId == 'local':
             wrap = wrapper.Local(device, self.arp_cache)
         elif typeId == 'ssh':
-            wrap = wrapper.SSH(device)
+            wrap = wrapper.SSH(device, self.tcp_prober)
         elif typeId == 'macos':
-            wrap = wrapper.macOS(device)
+            wrap = wrapper.macOS(device, self.tcp_prober)
         else:
             self.logger.error(u'unknown device type: %s', typeId)
 
         self.wrappers[device.id] = wrap
 
-        # XXX we might want to make sure the device status is updated here...
-        # the problem with that is it makes for a long plugin startup if all
-        # devices update status - especially things like ping and http.
-        # !! when status is updated here, start the thread loop with a sleep !!
-        #if device.configured: wrap.updateStatus()
+        # Local devices are also found by hardware address for neighbor events
+        if typeId == 'local' and wrap.client.hwaddr is not None:
+            self.local_devices.setdefault(wrap.client.hwaddr, set()).add(device.id)
+
+        if wrap is not None: wrap.heartbeatInterval = self.heartbeatInterval
+
+        # stagger the first check so startup is quick, but states converge soon
+        if wrap is not None:
+            self.scheduler.add(device.id, self._getPollInterval(wrap),
+                               self._getWarmupDelay(wrap))
 
     #---------------------------------------------------------------------------
     def deviceStopComm(self, device):
         iplug.ThreadedPlugin.deviceStopComm(self, device)
-        self.wrappers.pop(device.id, None)
+
+        wrap = self.wrappers.pop(device.id, None)
+        if wrap is not None: wrap.stop()
+
+        for devices in self.local_devices.values():
+            devices.discard(device.id)
+
+        self.scheduler.remove(device.id)
+
+    #---------------------------------------------------------------------------
+    def shutdown(self):
+        iplug.ThreadedPlugin.shutdown(self)
+
+        if self.neighbor_listener is not None:
+            self.neighbor_listener.stop()
+
+        # release shared resources, such as ssh master connections
+        for wrap in self.wrappers.values():
+            if wrap is not None: wrap.stop()
 
     #---------------------------------------------------------------------------
     def loadPluginPrefs(self, prefs):
@@ -86,16 +139,131 @@ class Plugin(iplug.ThreadedPlugin):
         sockTimeout = self.getPrefAsInt(prefs, 'connectionTimeout', 5)
         socket.setdefaulttimeout(sockTimeout)
 
-        # setup the arp cache with configured timeout
+        # setup the arp cache with configured timeout; Local devices hold a
+        # reference to the cache, so it must survive a change in prefs
         arpTimeout = self.getPrefAsInt(prefs, 'arpCacheTimeout', 300)
-        self.arp_cache = arp.ArpCache(arpTimeout)
+        if self.arp_cache is None:
+            self.arp_cache = arp.ArpCache(arpTimeout)
+        self.arp_cache.timeout = arpTimeout
+
+        # the sweeper holds targets for all Ping devices, so keep it across reloads
+        if self.icmp_sweeper is None:
+            self.icmp_sweeper = icmp.IcmpSweeper()
+        self.icmp_sweeper.timeout = sockTimeout
+
+        # same for the TCP prober used by Service, SSH and macOS devices
+        if self.tcp_prober is None:
+            self.tcp_prober = tcp.ConnectProber()
+        self.tcp_prober.timeout = sockTimeout
+
+        # HTTP devices share persistent connections to each host
+        if self.http_pool is None:
+            self.http_pool = httppool.HttpConnectionPool()
+        self.http_pool.timeout = sockTimeout
+
+        # devices checking the same target share a single probe per cycle
+        if self.probe_cache is None:
+            self.probe_cache = probecache.ProbeCache()
+            clients.ClientBase.probeCache = self.probe_cache
+
+        # setup the device poller with configured concurrency
+        maxProbes = self.getPrefAsInt(prefs, 'maxConcurrentProbes', 16)
+        self.poller = poller.DevicePoller(maxProbes)
+
+        # local and remote commands share the same limits
+        supervisor.defaultSupervisor.maxProcesses = maxProbes
+        supervisor.defaultSupervisor.timeout = self.getPrefAsInt(prefs, 'commandTimeout', 30)
+
+        # devices keep their place in the schedule when the interval changes
+        self.refreshInterval = self.getPrefAsInt(prefs, 'threadLoopDelay', 60)
+
+        if self.scheduler is None:
+            self.scheduler = scheduler.PollScheduler()
+            self.scheduler.add(self.ARP_REBUILD, self.refreshInterval)
+
+        self.scheduler.setInterval(self.ARP_REBUILD, self.refreshInterval)
+
+        # how often to update 'lastActiveAt' for devices that stay active
+        self.heartbeatInterval = self.getPrefAsInt(prefs, 'heartbeatInterval', 300)
+
+        for id, wrap in self.wrappers.items():
+            if wrap is not None:
+                self.scheduler.setInterval(id, self._getPollInterval(wrap))
+                wrap.heartbeatInterval = self.heartbeatInterval
+
+        # optionally pick up new neighbors as soon as the kernel reports them
+        if prefs.get('watchNeighbors', True):
+            self._startNeighborListener()
+        elif self.neighbor_listener is not None:
+            self.neighbor_listener.stop()
+            self.neighbor_listener = None
+
+    #---------------------------------------------------------------------------
+    def _startNeighborListener(self):
+        if self.neighbor_listener is not None: return
+        if not netlink.NeighborListener.isSupported(): return
+
+        listener = netlink.NeighborListener(self.arp_cache, self._neighborArrived)
+
+        # the ARP cache is rebuilt on every refresh either way
+        if listener.start():
+            self.neighbor_listener = listener
+        else:
+            self.logger.debug(u'neighbor table changes are not available')
+
+    #---------------------------------------------------------------------------
+    # called from the listener thread; devices are updated by the run loop
+    def _neighborArrived(self, hwaddr):
+        for id in self.local_devices.get(hwaddr, [ ]):
+            self.scheduler.expedite(id)
+
+    #---------------------------------------------------------------------------
+    def _getPollInterval(self, wrap):
+        return self.refreshInterval * wrap.pollFactor
+
+    #---------------------------------------------------------------------------
+    # each tier gets a slice of the warmup period, with devices spread randomly
+    # inside the slice so they don't all hit the network at once
+    def _getWarmupDelay(self, wrap):
+        period = min(self.warmupPeriod, self._getPollInterval(wrap))
+        slot = float(period) / self.warmupTiers
+
+        tier = min(wrap.warmupTier, self.warmupTiers - 1)
+        return slot * (tier + random.random())
 
     #---------------------------------------------------------------------------
     def refreshAllDevices(self):
         # update all enabled and configured devices
-        for id in self.wrappers:
-            wrap = self.wrappers[id]
-            wrap.updateStatus()
+        wrappers = [ wrap for wrap in self.wrappers.values() if wrap is not None ]
+        self.pollDevices(wrappers)
+
+    #---------------------------------------------------------------------------
+    def pollDevices(self, wrappers):
+        if len(wrappers) == 0: return
+
+        # gather batched targets so each engine probes them all at once
+        sweeps = dict()
+        for wrap in wrappers:
+            for engine, target in wrap.getSweepTargets():
+                sweeps.setdefault(engine, list()).append(target)
+
+        # devices pick up the sweep results when updating their status
+        self.poller.pollAll(sweeps.items(), lambda sweep: sweep[0].sweep(sweep[1]))
+
+        # results from previous cycles are of no use to anyone
+        self.probe_cache.purge()
+
+        cycleTime = self.poller.pollAll(wrappers, self._pollDevice)
+        self.logger.debug(u'refreshed %d devices in %.3f sec', len(wrappers), cycleTime)
+
+    #---------------------------------------------------------------------------
+    def _pollDevice(self, wrap):
+        available = None
+
+        try:
+            available = wrap.updateStatus()
+        finally:
+            self.scheduler.reschedule(wrap.device.id, available)
 
     #---------------------------------------------------------------------------
     def rebuildArpCache(self):
@@ -103,8 +271,35 @@ class Plugin(iplug.ThreadedPlugin):
 
     #---------------------------------------------------------------------------
     def runLoopStep(self):
-        self.rebuildArpCache()
-        self.refreshAllDevices()
+        due = self.scheduler.getDueItems()
+
+        # rebuild the cache first so Local devices see the latest table
+        if self.ARP_REBUILD in due:
+            due.remove(self.ARP_REBUILD)
+
+            try:
+                self.rebuildArpCache()
+            finally:
+                self.scheduler.reschedule(self.ARP_REBUILD)
+
+        wrappers = [ self.wrappers.get(id) for id in due ]
+        self.pollDevices([ wrap for wrap in wrappers if wrap is not None ])
+
+    #---------------------------------------------------------------------------
+    # run the loop whenever the next device is due, rather than on a fixed delay
+    def runConcurrentThread(self):
+        try:
+            while True:
+                self.runLoopStep()
+
+                # wake up at least once a second to pick up new devices
+                wait = self.scheduler.getTimeUntilNext()
+                if wait is None or wait > 1: wait = 1
+
+                self.sleep(wait)
+
+        except self.StopThread:
+            pass
 
     #---------------------------------------------------------------------------
     # Relay / Dimmer Action callback
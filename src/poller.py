@@ -0,0 +1,62 @@
+## concurrent polling for Network Devices
+
+import logging
+import threading
+import time
+import Queue
+
+################################################################################
+# runs a probe function over a set of items using a bounded pool of workers
+class DevicePoller():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, maxWorkers=16):
+        self.logger = logging.getLogger('Plugin.poller.DevicePoller')
+
+        self.maxWorkers = max(1, maxWorkers)
+        self.lastCycleTime = None
+
+    #---------------------------------------------------------------------------
+    # calls func(item) for every item; returns the wall time of the cycle
+    def pollAll(self, items, func):
+        items = list(items)
+        if len(items) == 0: return 0.0
+
+        work = Queue.Queue()
+        for item in items: work.put(item)
+
+        # no sense in starting more threads than we have items
+        numWorkers = min(self.maxWorkers, len(items))
+        self.logger.debug(u'polling %d items with %d workers', len(items), numWorkers)
+
+        cycleStart = time.time()
+
+        workers = list()
+        for idx in range(numWorkers):
+            worker = threading.Thread(target=self._worker, args=(work, func))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        for worker in workers: worker.join()
+
+        cycleTime = time.time() - cycleStart
+        self.lastCycleTime = cycleTime
+
+        self.logger.debug(u'poll cycle complete: %d items in %.3f sec', len(items), cycleTime)
+
+        return cycleTime
+
+    #---------------------------------------------------------------------------
+    def _worker(self, work, func):
+        while True:
+            try:
+                item = work.get_nowait()
+            except Queue.Empty:
+                break
+
+            # a single failing probe should not abort the rest of the cycle
+            try:
+                func(item)
+            except Exception as e:
+                self.logger.error(u'poll failed: %s', str(e))
@@ -0,0 +1,98 @@
+## shared probe results for Network Devices
+
+import time
+import logging
+import threading
+
+################################################################################
+# short-lived cache of probe results, keyed by what is being probed (e.g. the
+# probe type, address and port); devices that check the same target share one
+# probe, and concurrent requests for the same key wait on the probe in flight
+class ProbeCache():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, ttl=5):
+        self.logger = logging.getLogger('Plugin.probecache.ProbeCache')
+
+        self.ttl = ttl
+
+        # key => (result, finishedAt)
+        self.results = dict()
+
+        # key => event that is set when the probe in flight is done
+        self.inflight = dict()
+
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    #---------------------------------------------------------------------------
+    # returns the cached result for key, or calls func() to get a new one
+    def get(self, key, func):
+        while True:
+            with self.lock:
+                result = self._getFresh(key)
+                if result is not None:
+                    self.hits += 1
+                    return result[0]
+
+                event = self.inflight.get(key)
+
+                # nobody is probing this key, so it is up to us
+                if event is None:
+                    event = threading.Event()
+                    self.inflight[key] = event
+                    self.misses += 1
+                    break
+
+                self.coalesced += 1
+
+            event.wait()
+
+            # the probe failed, so try again on our own
+            with self.lock:
+                if key not in self.results:
+                    self.logger.debug(u'shared probe failed: %s', key)
+                    return func()
+
+        try:
+            value = func()
+
+            with self.lock:
+                self.results[key] = (value, time.time())
+
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+            event.set()
+
+        return value
+
+    #---------------------------------------------------------------------------
+    # drop all results that have expired
+    def purge(self):
+        now = time.time()
+
+        with self.lock:
+            for key, result in self.results.items():
+                if now - result[1] >= self.ttl: del self.results[key]
+
+    #---------------------------------------------------------------------------
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+    #---------------------------------------------------------------------------
+    # must be called while holding the lock
+    def _getFresh(self, key):
+        result = self.results.get(key)
+        if result is None: return None
+
+        if time.time() - result[1] >= self.ttl:
+            del self.results[key]
+            return None
+
+        return result
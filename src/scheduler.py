@@ -0,0 +1,152 @@
+## per-device poll scheduling for Network Devices
+
+import time
+import heapq
+import logging
+import threading
+
+################################################################################
+# tracks the next due time for each item in a priority queue
+#
+# items that stay down are checked less often (exponential backoff), while
+# items that just changed state are checked again soon to confirm the change
+class PollScheduler():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, maxBackoff=8, recheckDelay=10):
+        self.logger = logging.getLogger('Plugin.scheduler.PollScheduler')
+
+        self.maxBackoff = maxBackoff
+        self.recheckDelay = recheckDelay
+
+        self.entries = dict()
+        self.queue = list()
+        self.overruns = 0
+
+        self.lock = threading.Lock()
+
+    #---------------------------------------------------------------------------
+    # add an item that is due after the given delay (in seconds)
+    def add(self, key, interval, delay=0):
+        now = time.time()
+
+        with self.lock:
+            entry = {
+                'interval' : interval,
+                'failures' : 0,
+                'active' : None,
+                'dueAt' : now + delay
+            }
+
+            self.entries[key] = entry
+            heapq.heappush(self.queue, (entry['dueAt'], key))
+
+    #---------------------------------------------------------------------------
+    def remove(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    #---------------------------------------------------------------------------
+    def setInterval(self, key, interval):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None: entry['interval'] = interval
+
+    #---------------------------------------------------------------------------
+    # make an item due now, e.g. when an event says its state has changed;
+    # items that are being polled at the moment are left alone
+    def expedite(self, key):
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry['dueAt'] is None: return False
+            if entry['dueAt'] <= now: return True
+
+            entry['dueAt'] = now
+            heapq.heappush(self.queue, (now, key))
+
+        return True
+
+    #---------------------------------------------------------------------------
+    # returns and removes all items that are currently due; each item must be
+    # given back using reschedule() once it has been polled
+    def getDueItems(self):
+        now = time.time()
+        due = list()
+        late = 0
+
+        with self.lock:
+            while len(self.queue) > 0 and self.queue[0][0] <= now:
+                dueAt, key = heapq.heappop(self.queue)
+
+                # skip removed items and stale queue entries
+                entry = self.entries.get(key)
+                if entry is None or entry['dueAt'] != dueAt: continue
+
+                # mark the item as in progress
+                entry['dueAt'] = None
+                due.append(key)
+
+                # a full interval late means the polling cannot keep up
+                if now - dueAt > entry['interval']: late += 1
+
+        if late > 0:
+            self.overruns += late
+            self.logger.warn(u'poll overrun: %d device(s) more than one interval late', late)
+
+        return due
+
+    #---------------------------------------------------------------------------
+    # schedule the next poll based on the result (True, False or None if unknown)
+    def reschedule(self, key, active=None):
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None: return None
+
+            interval = entry['interval']
+            changed = (entry['active'] is not None and active is not None
+                       and entry['active'] != active)
+
+            if active is False:
+                entry['failures'] += 1
+            elif active is True:
+                entry['failures'] = 0
+
+            if changed:
+                delay = min(self.recheckDelay, interval)
+            elif active is False:
+                backoff = 2 ** max(entry['failures'] - 2, 0)
+                delay = interval * min(backoff, self.maxBackoff)
+            else:
+                delay = interval
+
+            if active is not None: entry['active'] = active
+
+            # if the item was already rescheduled, keep the earlier time
+            dueAt = now + delay
+            if entry['dueAt'] is not None and entry['dueAt'] <= dueAt:
+                return entry['dueAt']
+
+            entry['dueAt'] = dueAt
+            heapq.heappush(self.queue, (dueAt, key))
+
+        return dueAt
+
+    #---------------------------------------------------------------------------
+    # seconds until the next item is due, or None if nothing is scheduled
+    def getTimeUntilNext(self):
+        with self.lock:
+            while len(self.queue) > 0:
+                dueAt, key = self.queue[0]
+
+                entry = self.entries.get(key)
+                if entry is not None and entry['dueAt'] == dueAt: break
+
+                heapq.heappop(self.queue)
+
+            if len(self.queue) == 0: return None
+
+            return max(self.queue[0][0] - time.time(), 0)
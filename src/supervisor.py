@@ -0,0 +1,197 @@
+## supervised command execution for Network Devices
+
+import os
+import time
+import errno
+import fcntl
+import select
+import signal
+import logging
+import threading
+import subprocess
+
+#-------------------------------------------------------------------------------
+# wait for any of the given file descriptors to become readable
+def waitReadable(fds, timeout):
+    if hasattr(select, 'poll'):
+        poller = select.poll()
+        for fd in fds:
+            poller.register(fd, select.POLLIN)
+
+        msec = None if timeout is None else timeout * 1000
+        events = poller.poll(msec)
+        return [ fd for fd, event in events ]
+
+    readable, _, _ = select.select(fds, [ ], [ ], timeout)
+    return readable
+
+################################################################################
+# the outcome of a single supervised command
+class ProcessResult():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, cmd):
+        self.cmd = cmd
+
+        self.returncode = None
+        self.stdout = ''
+        self.stderr = ''
+
+        self.timedOut = False
+        self.elapsed = None
+
+    #---------------------------------------------------------------------------
+    def isSuccess(self):
+        return (self.returncode == 0 and not self.timedOut)
+
+################################################################################
+# runs commands with a hard deadline and a global limit on running processes
+class ProcessSupervisor():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, maxProcesses=16, timeout=30, maxOutput=65536):
+        self.logger = logging.getLogger('Plugin.supervisor.ProcessSupervisor')
+
+        self.maxProcesses = maxProcesses
+        self.timeout = timeout
+        self.maxOutput = maxOutput
+
+        self.running = 0
+        self.slots = threading.Condition()
+
+    #---------------------------------------------------------------------------
+    def _acquireSlot(self):
+        with self.slots:
+            while self.running >= self.maxProcesses:
+                self.slots.wait()
+
+            self.running += 1
+
+    #---------------------------------------------------------------------------
+    def _releaseSlot(self):
+        with self.slots:
+            self.running -= 1
+            self.slots.notify()
+
+    #---------------------------------------------------------------------------
+    # run the command; never takes longer than the timeout (in seconds)
+    def run(self, cmd, timeout=None):
+        if timeout is None: timeout = self.timeout
+        result = ProcessResult(cmd)
+
+        self._acquireSlot()
+
+        try:
+            self._run(cmd, timeout, result)
+        finally:
+            self._releaseSlot()
+
+        return result
+
+    #---------------------------------------------------------------------------
+    def _run(self, cmd, timeout, result):
+        started = time.time()
+        deadline = (started + timeout) if timeout > 0 else None
+
+        # each command gets its own process group, so children go with it
+        try:
+            with open(os.devnull) as devnull:
+                proc = subprocess.Popen(cmd, stdin=devnull, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, close_fds=True,
+                                        preexec_fn=os.setsid)
+        except OSError as e:
+            self.logger.warn(u'%s: %s', cmd[0], str(e))
+            result.stderr = str(e)
+            return
+
+        try:
+            if self._collectOutput(proc, deadline, result):
+                self._collectExit(proc, deadline, result)
+            else:
+                self._timedOut(proc, result)
+        finally:
+            if proc.returncode is None: self._kill(proc)
+
+            proc.stdout.close()
+            proc.stderr.close()
+
+        result.returncode = proc.returncode
+        result.elapsed = time.time() - started
+
+    #---------------------------------------------------------------------------
+    # read both pipes until they close, keeping a bounded amount of output;
+    # returns False if the deadline passed first
+    def _collectOutput(self, proc, deadline, result):
+        output = {
+            proc.stdout.fileno() : [ 'stdout', list(), 0 ],
+            proc.stderr.fileno() : [ 'stderr', list(), 0 ]
+        }
+
+        streams = output.keys()
+
+        for fd in streams:
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+        while len(streams) > 0:
+            remaining = None
+
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0: break
+
+            for fd in waitReadable(streams, remaining):
+                try:
+                    data = os.read(fd, 4096)
+                except OSError as e:
+                    if e.errno in (errno.EAGAIN, errno.EINTR): continue
+                    raise
+
+                if len(data) == 0:
+                    streams.remove(fd)
+                    continue
+
+                # keep reading past the limit so the child never blocks on a full pipe
+                name, chunks, size = output[fd]
+                if size < self.maxOutput:
+                    chunks.append(data[:self.maxOutput - size])
+                    output[fd][2] = size + len(chunks[-1])
+
+        for name, chunks, size in output.values():
+            setattr(result, name, ''.join(chunks))
+
+        return (len(streams) == 0)
+
+    #---------------------------------------------------------------------------
+    # check for the exit status without blocking past the deadline
+    def _collectExit(self, proc, deadline, result):
+        delay = 0.001
+
+        while proc.poll() is None:
+            if deadline is not None and time.time() >= deadline:
+                self._timedOut(proc, result)
+                break
+
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    #---------------------------------------------------------------------------
+    def _timedOut(self, proc, result):
+        self.logger.warn(u'command timed out: %s', result.cmd[0])
+        result.timedOut = True
+
+        # the process may have exited, but its children are still holding on
+        self._kill(proc)
+
+    #---------------------------------------------------------------------------
+    def _kill(self, proc):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+        proc.wait()
+
+#-------------------------------------------------------------------------------
+# the supervisor shared by all clients
+defaultSupervisor = ProcessSupervisor()
@@ -0,0 +1,168 @@
+## multiplexed TCP connect probes for Network Devices
+
+import time
+import errno
+import select
+import socket
+import logging
+import threading
+
+# connect_ex results that mean the connection is still in progress
+CONNECT_PENDING = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN)
+
+#-------------------------------------------------------------------------------
+# wait for any of the given file descriptors to become writable
+def waitWritable(fds, timeout):
+    if hasattr(select, 'poll'):
+        poller = select.poll()
+        for fd in fds:
+            poller.register(fd, select.POLLOUT)
+
+        events = poller.poll(timeout * 1000)
+        return [ fd for fd, event in events ]
+
+    _, writable, _ = select.select([ ], fds, [ ], timeout)
+    return writable
+
+################################################################################
+# starts non-blocking connects to all registered targets at once
+class ConnectProber():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, timeout=5, maxSockets=256):
+        self.logger = logging.getLogger('Plugin.tcp.ConnectProber')
+
+        self.timeout = timeout
+        self.maxSockets = maxSockets
+
+        self.targets = dict()
+        self.results = dict()
+
+        self.targetLock = threading.Lock()
+        self.sweepLock = threading.Lock()
+
+    #---------------------------------------------------------------------------
+    def register(self, address, port):
+        target = (address, port)
+
+        with self.targetLock:
+            self.targets[target] = self.targets.get(target, 0) + 1
+
+    #---------------------------------------------------------------------------
+    def unregister(self, address, port):
+        target = (address, port)
+
+        with self.targetLock:
+            count = self.targets.get(target, 0) - 1
+
+            if count > 0:
+                self.targets[target] = count
+            else:
+                self.targets.pop(target, None)
+                self.results.pop(target, None)
+
+    #---------------------------------------------------------------------------
+    # True / False from the last sweep or None if the target has not been swept
+    def getResult(self, address, port):
+        target = (address, port)
+
+        if target not in self.results: return None
+        return (self.results[target] is not None)
+
+    #---------------------------------------------------------------------------
+    # connect time (in seconds) from the last sweep or None
+    def getConnectTime(self, address, port):
+        return self.results.get((address, port), None)
+
+    #---------------------------------------------------------------------------
+    # probe the given (or all registered) targets; returns the number of open targets
+    def sweep(self, targets=None):
+        if targets is not None:
+            targets = list(set(targets))
+        else:
+            with self.targetLock:
+                targets = self.targets.keys()
+
+        if len(targets) == 0: return 0
+
+        results = dict()
+
+        # limit the number of open sockets by probing in batches
+        with self.sweepLock:
+            for idx in range(0, len(targets), self.maxSockets):
+                batch = targets[idx:idx+self.maxSockets]
+                results.update(self._probeBatch(batch))
+
+        self.results.update(results)
+
+        alive = len([ ctime for ctime in results.values() if ctime is not None ])
+        self.logger.debug(u'TCP sweep: %d of %d targets connected', alive, len(targets))
+
+        return alive
+
+    #---------------------------------------------------------------------------
+    def _resolve(self, address, port):
+        try:
+            info = socket.getaddrinfo(address, port, socket.AF_INET, socket.SOCK_STREAM)
+        except socket.error as e:
+            self.logger.debug(u'cannot resolve %s: %s', address, str(e))
+            return None
+
+        if len(info) == 0: return None
+
+        family, socktype, proto, canonname, sockaddr = info[0]
+        return sockaddr
+
+    #---------------------------------------------------------------------------
+    def _startConnect(self, sockaddr):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+
+        err = sock.connect_ex(sockaddr)
+
+        if err == 0 or err in CONNECT_PENDING:
+            return sock
+
+        sock.close()
+        return None
+
+    #---------------------------------------------------------------------------
+    def _probeBatch(self, targets):
+        results = dict.fromkeys(targets)
+        pending = dict()
+
+        for target in targets:
+            sockaddr = self._resolve(*target)
+            if sockaddr is None: continue
+
+            sock = self._startConnect(sockaddr)
+            if sock is None: continue
+
+            pending[sock.fileno()] = (target, sock, time.time())
+
+        timeout = self.timeout if self.timeout > 0 else 1
+        deadline = time.time() + timeout
+
+        try:
+            while len(pending) > 0:
+                remaining = deadline - time.time()
+                if remaining <= 0: break
+
+                ready = waitWritable(pending.keys(), remaining)
+                if len(ready) == 0: break
+
+                now = time.time()
+
+                for fd in ready:
+                    target, sock, startedAt = pending.pop(fd)
+
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if err == 0: results[target] = now - startedAt
+
+                    sock.close()
+
+        finally:
+            for target, sock, startedAt in pending.values():
+                sock.close()
+
+        return results
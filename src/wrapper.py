@@ -6,6 +6,7 @@ import time
 
 import arp
 import clients
+import metrics
 import iplug
 
 # TODO set setErrorStateOnServer(msg) appropriately
@@ -14,32 +15,117 @@ import iplug
 # wrapper base class for device types
 class DeviceWrapper():
 
+    # poll interval, as a multiple of the plugin refresh interval
+    pollFactor = 1.0
+
+    # when the first check runs at startup - cheap devices go first
+    warmupTier = 1
+
+    # minimum time (in seconds) between 'lastActiveAt' updates for active devices
+    heartbeatInterval = 300
+
+    # relative change needed before latency states are sent to the server
+    latencyDeadband = 0.1
+
+    # the state values last sent to the server
+    lastStates = None
+    lastHeartbeat = 0
+
+    # recent latency samples (in milliseconds)
+    latencyHistory = None
+
     #---------------------------------------------------------------------------
     def __init__(self, device):
         raise NotImplementedError()
 
     #---------------------------------------------------------------------------
-    # basic check to see if the virtual device is responding
+    # basic check to see if the virtual device is responding; returns the result
     def updateStatus(self):
         device = self.device
+        available, latency = self.client.probe()
 
-        if self.client.isAvailable():
+        if available:
             self.logger.debug(u'%s is AVAILABLE', device.name)
-            device.updateStateOnServer('active', True)
-            device.updateStateOnServer('status', 'Active')
-            device.updateStateOnServer('lastActiveAt', time.strftime('%c'))
+            states = { 'active' : True, 'status' : 'Active' }
+            states.update(self._getLatencyStates(latency))
+
+            # refresh the timestamp when the device comes up or is due for a heartbeat
+            now = time.time()
+            if self._hasChanged('active', True) or now - self.lastHeartbeat >= self.heartbeatInterval:
+                states['lastActiveAt'] = time.strftime('%c')
+                self.lastHeartbeat = now
 
         else:
             self.logger.debug(u'%s is UNAVAILABLE', device.name)
-            device.updateStateOnServer('active', False)
-            device.updateStateOnServer('status', 'Inactive')
+            states = { 'active' : False, 'status' : 'Inactive' }
 
+        self._updateStates(states)
         self.updateDeviceInfo()
 
+        return available
+
+    #---------------------------------------------------------------------------
+    def _hasChanged(self, key, value):
+        if self.lastStates is None:
+            self.lastStates = dict(self.device.states)
+
+        return (key not in self.lastStates or self.lastStates[key] != value)
+
+    #---------------------------------------------------------------------------
+    # record the latency and return the latency states worth sending
+    def _getLatencyStates(self, latency):
+        if latency is None: return { }
+
+        if self.latencyHistory is None:
+            self.latencyHistory = metrics.RollingWindow()
+
+        history = self.latencyHistory
+        history.add(latency * 1000)
+
+        states = {
+            'latency' : round(history.last, 2),
+            'latencyAvg' : round(history.getAverage(), 2),
+            'latencyP95' : round(history.getPercentile(95), 2)
+        }
+
+        return dict([ (key, value) for key, value in states.items()
+                      if self._isSignificant(key, value) ])
+
+    #---------------------------------------------------------------------------
+    # small changes in latency are not worth an update to the server
+    def _isSignificant(self, key, value):
+        if not self._hasChanged(key, value): return False
+
+        last = self.lastStates.get(key)
+        if not isinstance(last, (int, long, float)): return True
+
+        return (abs(value - last) >= max(abs(last) * self.latencyDeadband, 1.0))
+
+    #---------------------------------------------------------------------------
+    # send only the states that have changed in a single update to the server
+    def _updateStates(self, states):
+        changed = [ { 'key' : key, 'value' : value }
+                    for key, value in states.items() if self._hasChanged(key, value) ]
+
+        if len(changed) == 0: return
+
+        self.logger.debug(u'%s: updating %d state(s)', self.device.name, len(changed))
+        self.device.updateStatesOnServer(changed)
+
+        self.lastStates.update(states)
+
+    #---------------------------------------------------------------------------
+    # (engine, target) pairs to be swept before updateStatus is called
+    def getSweepTargets(self): return [ ]
+
     #---------------------------------------------------------------------------
     # sub-classes should overide this for their custom states
     def updateDeviceInfo(self): pass
 
+    #---------------------------------------------------------------------------
+    # sub-classes should overide this to release any shared resources
+    def stop(self): pass
+
 ################################################################################
 # base wrapper class for relay-type devices
 class RelayDeviceWrapper(DeviceWrapper):
@@ -59,33 +145,53 @@ class RelayDeviceWrapper(DeviceWrapper):
         self.logger.warn(u'Not supported - Turn On %s', self.device.name)
 
     #---------------------------------------------------------------------------
-    # basic check to see if the virtual device is responding
+    # basic check to see if the virtual device is responding; returns the result
     def updateStatus(self):
         device = self.device
+        available, latency = self.client.probe()
 
-        if self.client.isAvailable():
+        if available:
             self.logger.debug(u'%s is AVAILABLE', device.name)
-            device.updateStateOnServer('onOffState', 'on')
+            states = { 'onOffState' : 'on' }
+            states.update(self._getLatencyStates(latency))
         else:
             self.logger.debug(u'%s is UNAVAILABLE', device.name)
-            device.updateStateOnServer('onOffState', 'off')
+            states = { 'onOffState' : 'off' }
+
+        self._updateStates(states)
 
         self.updateDeviceInfo()
 
+        return available
+
 ################################################################################
 # plugin device wrapper for Network Service devices
 class Service(DeviceWrapper):
 
     #---------------------------------------------------------------------------
-    def __init__(self, device):
+    def __init__(self, device, prober=None):
         self.logger = logging.getLogger('Plugin.wrapper.Service')
 
         address = device.pluginProps['address']
         port = int(device.pluginProps['port'])
-        client = clients.ServiceClient(address, port)
+        client = clients.ServiceClient(address, port, prober)
+
+        # results are gathered by the prober for all TCP devices at once
+        if prober is not None: prober.register(address, port)
 
         self.device = device
         self.client = client
+        self.prober = prober
+
+    #---------------------------------------------------------------------------
+    def stop(self):
+        if self.prober is not None:
+            self.prober.unregister(self.client.address, self.client.port)
+
+    #---------------------------------------------------------------------------
+    def getSweepTargets(self):
+        if self.prober is None: return [ ]
+        return [ (self.prober, (self.client.address, self.client.port)) ]
 
     #---------------------------------------------------------------------------
     @staticmethod
@@ -98,13 +204,27 @@ class Service(DeviceWrapper):
 class Ping(DeviceWrapper):
 
     #---------------------------------------------------------------------------
-    def __init__(self, device):
+    def __init__(self, device, sweeper=None):
         self.logger = logging.getLogger('Plugin.wrapper.Ping')
 
         address = device.pluginProps['address']
 
+        # results are gathered by the sweeper for all Ping devices at once
+        if sweeper is not None: sweeper.register(address)
+
         self.device = device
-        self.client = clients.PingClient(address)
+        self.sweeper = sweeper
+        self.client = clients.PingClient(address, sweeper)
+
+    #---------------------------------------------------------------------------
+    def stop(self):
+        if self.sweeper is not None:
+            self.sweeper.unregister(self.client.address)
+
+    #---------------------------------------------------------------------------
+    def getSweepTargets(self):
+        if self.sweeper is None: return [ ]
+        return [ (self.sweeper, self.client.address) ]
 
     #---------------------------------------------------------------------------
     @staticmethod
@@ -116,18 +236,21 @@ class Ping(DeviceWrapper):
 class HTTP(DeviceWrapper):
 
     #---------------------------------------------------------------------------
-    def __init__(self, device):
+    def __init__(self, device, pool=None):
         self.logger = logging.getLogger('Plugin.wrapper.HTTP')
 
         url = device.pluginProps['url']
+        method = device.pluginProps.get('method', 'GET')
+        maxRedirects = int(device.pluginProps.get('maxRedirects', 5))
 
         self.device = device
-        self.client = clients.HttpClient(url)
+        self.client = clients.HttpClient(url, pool, method, maxRedirects)
 
     #---------------------------------------------------------------------------
     @staticmethod
     def validateConfig(values, errors):
         iplug.validateConfig_URL('url', values, errors, emptyOk=False)
+        iplug.validateConfig_Int('maxRedirects', values, errors, min=0, max=20)
 
         # update 'address' for proper display
         url = values['url']
@@ -139,6 +262,9 @@ class HTTP(DeviceWrapper):
 # plugin device wrapper for Local Device types
 class Local(DeviceWrapper):
 
+    # only looks at the ARP cache, so this is checked right away
+    warmupTier = 0
+
     #---------------------------------------------------------------------------
     def __init__(self, device, arpTable):
         self.logger = logging.getLogger('Plugin.wrapper.Local')
@@ -157,20 +283,40 @@ class Local(DeviceWrapper):
 # plugin device wrapper for SSH Device types
 class SSH(RelayDeviceWrapper):
 
+    # remote commands are expensive, so check these half as often
+    pollFactor = 2.0
+    warmupTier = 2
+
     #---------------------------------------------------------------------------
-    def __init__(self, device):
+    def __init__(self, device, prober=None):
         self.logger = logging.getLogger('Plugin.wrapper.SSH')
 
         address = device.pluginProps['address']
         port = int(device.pluginProps['port'])
         uname = device.pluginProps['username']
-        client = clients.SSHClient(address, port=port, username=uname)
+        client = clients.SSHClient(address, port=port, username=uname, prober=prober)
 
         client.commands['status'] = device.pluginProps['cmd_status']
         client.commands['shutdown'] = device.pluginProps['cmd_shutdown']
 
+        if prober is not None: prober.register(address, port)
+
         self.client = client
         self.device = device
+        self.prober = prober
+
+    #---------------------------------------------------------------------------
+    def stop(self):
+        if self.prober is not None:
+            self.prober.unregister(self.client.address, self.client.port)
+
+        # reap the shared ssh master connection
+        self.client.close()
+
+    #---------------------------------------------------------------------------
+    def getSweepTargets(self):
+        if self.prober is None: return [ ]
+        return [ (self.prober, (self.client.address, self.client.port)) ]
 
     #---------------------------------------------------------------------------
     @staticmethod
@@ -196,23 +342,43 @@ class SSH(RelayDeviceWrapper):
 # plugin device wrapper for macOS Device types
 class macOS(RelayDeviceWrapper):
 
+    # remote commands are expensive, so check these half as often
+    pollFactor = 2.0
+    warmupTier = 2
+
     # XXX could we use remote management instead of SSH?
 
     #---------------------------------------------------------------------------
-    def __init__(self, device):
+    def __init__(self, device, prober=None):
         self.logger = logging.getLogger('Plugin.wrapper.macOS')
 
         address = device.pluginProps['address']
         uname = device.pluginProps.get('username', None)
         passwd = device.pluginProps.get('password', None)
-        client = clients.SSHClient(address, username=uname, password=passwd)
+        client = clients.SSHClient(address, username=uname, password=passwd, prober=prober)
 
         # macOS commands are known and cannot be changed by the user
         client.commands['status'] = '/usr/bin/true'
         client.commands['shutdown'] = '/sbin/shutdown -h now'
 
+        if prober is not None: prober.register(address, client.port)
+
         self.client = client
         self.device = device
+        self.prober = prober
+
+    #---------------------------------------------------------------------------
+    def stop(self):
+        if self.prober is not None:
+            self.prober.unregister(self.client.address, self.client.port)
+
+        # reap the shared ssh master connection
+        self.client.close()
+
+    #---------------------------------------------------------------------------
+    def getSweepTargets(self):
+        if self.prober is None: return [ ]
+        return [ (self.prober, (self.client.address, self.client.port)) ]
 
     #---------------------------------------------------------------------------
     @staticmethod
@@ -0,0 +1,190 @@
+#!/usr/bin/env python2.7
+
+## throughput benchmarks for Network Devices clients using local stand-ins
+#
+# usage: bench_clients.py [--scales 10,100,1000] [--clients service,http,...]
+#
+# each client type is driven through the plugin polling path (DevicePoller and
+# the shared sweep engines) against local listeners, a local HTTP server and
+# fake ping / ssh / arp commands; no network access is required
+
+import sys
+import time
+import logging
+import optparse
+
+import arp
+import tcp
+import icmp
+import poller
+import clients
+import httppool
+import metrics
+import standins
+
+# keep logging output to a minumim for benchmarks
+logging.basicConfig(level=logging.CRITICAL)
+
+CONCURRENCY = 16
+
+################################################################################
+# collects the outcome of a single benchmark run
+class BenchResult():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, name, scale):
+        self.name = name
+        self.scale = scale
+
+        self.elapsed = None
+        self.available = 0
+        self.latency = metrics.RollingWindow(scale)
+
+    #---------------------------------------------------------------------------
+    def probe(self, client):
+        available, latency = client.probe()
+
+        if available: self.available += 1
+        if latency is not None: self.latency.add(latency * 1000)
+
+    #---------------------------------------------------------------------------
+    def report(self):
+        rate = self.scale / self.elapsed if self.elapsed > 0 else 0
+        avg = self.latency.getAverage()
+        p95 = self.latency.getPercentile(95)
+
+        print '%-20s %6d %6d %10.3f %12.1f %10s %10s' % (
+            self.name, self.scale, self.available, self.elapsed, rate,
+            '-' if avg is None else '%.3f' % avg,
+            '-' if p95 is None else '%.3f' % p95
+        )
+
+#-------------------------------------------------------------------------------
+# time the sweep (if any) plus polling every client with the worker pool
+def run(name, scale, clients, sweep=None):
+    result = BenchResult(name, scale)
+    pool = poller.DevicePoller(CONCURRENCY)
+
+    started = time.time()
+
+    if sweep is not None: sweep()
+    pool.pollAll(clients, result.probe)
+
+    result.elapsed = time.time() - started
+    result.report()
+
+#-------------------------------------------------------------------------------
+def benchService(scale, fake):
+    listeners = standins.TcpListeners(scale / 2)
+    ports = listeners.ports + [ standins.closedPort() for idx in range(scale - len(listeners.ports)) ]
+
+    try:
+        targets = [ clients.ServiceClient('127.0.0.1', port) for port in ports ]
+        run('service (blocking)', scale, targets)
+
+        prober = tcp.ConnectProber(timeout=1)
+        targets = [ clients.ServiceClient('127.0.0.1', port, prober) for port in ports ]
+        sweep = lambda: prober.sweep([ ('127.0.0.1', port) for port in ports ])
+        run('service (prober)', scale, targets, sweep)
+
+    finally:
+        listeners.close()
+
+#-------------------------------------------------------------------------------
+def benchHttp(scale, fake):
+    server = standins.startHttpServer()
+    base = 'http://127.0.0.1:%d' % server.server_port
+
+    try:
+        pool = httppool.HttpConnectionPool(timeout=2, maxIdle=CONCURRENCY)
+
+        targets = [ clients.HttpClient('%s/200?id=%d' % (base, idx), pool) for idx in range(scale) ]
+        run('http (keep-alive)', scale, targets)
+
+        targets = [ clients.HttpClient('%s/200?id=%d&delay=0.01' % (base, idx), pool)
+                    for idx in range(scale) ]
+        run('http (10ms server)', scale, targets)
+
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
+
+#-------------------------------------------------------------------------------
+def benchPing(scale, fake):
+    clients.PingClient.pingCommand = fake.ping
+
+    targets = [ clients.PingClient('127.0.0.1') for idx in range(scale) ]
+    run('ping (command)', scale, targets)
+
+    sweeper = icmp.IcmpSweeper(timeout=1)
+    if sweeper._openSocket() is None: return
+
+    # every address in 127/8 is loopback on linux; elsewhere reuse 127.0.0.1
+    if sys.platform.startswith('linux'):
+        addresses = [ '127.0.%d.%d' % (idx >> 8, (idx & 0xFF) or 1) for idx in range(scale) ]
+    else:
+        addresses = [ '127.0.0.1' ] * scale
+
+    targets = [ clients.PingClient(address, sweeper) for address in addresses ]
+    run('ping (sweeper)', scale, targets, lambda: sweeper.sweep(addresses))
+
+#-------------------------------------------------------------------------------
+def benchArp(scale, fake):
+    neighbors = standins.makeNeighbors(scale)
+    fake.setNeighbors(neighbors)
+
+    for name, source in (('arp (command)', arp.ArpCommandTable(cmd=(fake.arp,))),
+                         ('arp (proc)', arp.ProcArpTable(fake.getProcTable()))):
+
+        cache = arp.ArpCache(timeout=5, source=source)
+        targets = [ clients.ArpClient(hwaddr, cache) for ipaddr, hwaddr in neighbors ]
+        run(name, scale, targets, cache.rebuildArpCache)
+
+#-------------------------------------------------------------------------------
+def benchSSH(scale, fake):
+    targets = list()
+
+    for idx in range(scale):
+        client = clients.SSHClient('host%d.example' % idx, multiplex=False)
+        client.sshCommand = fake.ssh
+        client.commands['status'] = '/bin/true'
+        targets.append(client)
+
+    run('ssh (command)', scale, targets)
+
+BENCHMARKS = [
+    ('service', benchService),
+    ('http', benchHttp),
+    ('ping', benchPing),
+    ('arp', benchArp),
+    ('ssh', benchSSH)
+]
+
+#-------------------------------------------------------------------------------
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--scales', default='10,100,1000')
+    parser.add_option('--clients', default=','.join([ name for name, bench in BENCHMARKS ]))
+    opts, args = parser.parse_args()
+
+    scales = [ int(scale) for scale in opts.scales.split(',') ]
+    selected = opts.clients.split(',')
+
+    standins.raiseFileLimit()
+    fake = standins.FakeCommands()
+
+    print '%-20s %6s %6s %10s %12s %10s %10s' % (
+        'client', 'count', 'up', 'time (s)', 'probes/sec', 'avg (ms)', 'p95 (ms)'
+    )
+
+    try:
+        for name, bench in BENCHMARKS:
+            if name not in selected: continue
+            for scale in scales: bench(scale, fake)
+    finally:
+        fake.close()
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
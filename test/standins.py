@@ -0,0 +1,210 @@
+## local stand-ins for the network services used by Network Devices clients
+
+import os
+import stat
+import time
+import shutil
+import socket
+import subprocess
+import urlparse
+import tempfile
+import threading
+import SocketServer
+import BaseHTTPServer
+
+#-------------------------------------------------------------------------------
+# returns a local port that nothing is listening on
+def closedPort():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+#-------------------------------------------------------------------------------
+# allow for large numbers of listeners and client sockets; not too many though,
+# since subprocess (close_fds) must close every possible descriptor
+def raiseFileLimit(limit=4096):
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard != resource.RLIM_INFINITY: limit = min(limit, hard)
+        if soft != limit: resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    except (ImportError, ValueError):
+        return
+
+    # python 2 reads this once at import time
+    subprocess.MAXFD = limit
+
+################################################################################
+# a set of local TCP listening sockets
+class TcpListeners():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, count=1):
+        self.sockets = list()
+
+        for idx in range(count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(('127.0.0.1', 0))
+            sock.listen(128)
+            self.sockets.append(sock)
+
+        self.ports = [ sock.getsockname()[1] for sock in self.sockets ]
+
+    #---------------------------------------------------------------------------
+    def close(self):
+        for sock in self.sockets: sock.close()
+
+################################################################################
+# responds with the status code given in the path, e.g. /404 or /200?delay=0.1
+class StatusHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    #---------------------------------------------------------------------------
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    #---------------------------------------------------------------------------
+    def do_GET(self):
+        url = urlparse.urlsplit(self.path)
+        query = urlparse.parse_qs(url.query)
+
+        delay = float(query.get('delay', [ 0 ])[0])
+        if delay > 0: time.sleep(delay)
+
+        if url.path == '/loop':
+            self.sendStatus(302, location='/loop')
+        elif url.path.startswith('/redirect'):
+            self.sendStatus(301, location='/200')
+        else:
+            self.sendStatus(int(url.path.strip('/')))
+
+    #---------------------------------------------------------------------------
+    def do_HEAD(self):
+        self.sendStatus(204, body=False)
+
+    #---------------------------------------------------------------------------
+    def sendStatus(self, status, location=None, body=True):
+        content = 'status %d\n' % status
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(content)))
+        if location is not None: self.send_header('Location', location)
+        self.end_headers()
+
+        if body: self.wfile.write(content)
+
+    #---------------------------------------------------------------------------
+    def log_message(self, format, *args): pass
+
+################################################################################
+class ThreadedHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    #---------------------------------------------------------------------------
+    # clients closing idle connections is expected
+    def handle_error(self, request, address): pass
+
+#-------------------------------------------------------------------------------
+def startHttpServer(sslContext=None, handler=StatusHandler):
+    server = ThreadedHTTPServer(('127.0.0.1', 0), handler)
+    server.connections = 0
+
+    if sslContext is not None:
+        server.socket = sslContext.wrap_socket(server.socket, server_side=True)
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+################################################################################
+# stand-in executables for the commands used by the clients:
+#   ping - succeeds for loopback addresses, fails for everything else
+#   ssh  - records its arguments; masters (-M) wait around until killed
+#   arp  - prints the neighbor table fixture
+class FakeCommands():
+
+    PING = '''#!/bin/sh
+for host in "$@"; do :; done
+case "$host" in
+  127.*|localhost) echo "64 bytes from $host: icmp_seq=0 ttl=64 time=0.042 ms"; exit 0 ;;
+esac
+exit 2
+'''
+
+    SSH = '''#!/bin/sh
+[ -n "$FAKE_SSH_LOG" ] && echo "$@" >> "$FAKE_SSH_LOG"
+case "$1" in
+  -M*) exec sleep 30 ;;
+esac
+exit 0
+'''
+
+    ARP = '''#!/bin/sh
+cat "%s"
+'''
+
+    #---------------------------------------------------------------------------
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix='netdev-')
+
+        self.ping = self._write('ping', self.PING)
+        self.ssh = self._write('ssh', self.SSH)
+
+        self.arpTable = os.path.join(self.path, 'arp.txt')
+        self.arp = self._write('arp', self.ARP % self.arpTable)
+
+        self.setNeighbors([ ])
+
+    #---------------------------------------------------------------------------
+    def _write(self, name, script):
+        path = os.path.join(self.path, name)
+
+        with open(path, 'w') as cmd:
+            cmd.write(script)
+
+        os.chmod(path, stat.S_IRWXU)
+        return path
+
+    #---------------------------------------------------------------------------
+    # entries are (ipaddr, hwaddr); written in both arp and /proc formats
+    def setNeighbors(self, entries):
+        writeNeighborTables(entries, self.arpTable, self.getProcTable())
+
+    #---------------------------------------------------------------------------
+    def getProcTable(self):
+        return os.path.join(self.path, 'proc_net_arp')
+
+    #---------------------------------------------------------------------------
+    def close(self):
+        shutil.rmtree(self.path)
+
+#-------------------------------------------------------------------------------
+def writeNeighborTables(entries, arpPath, procPath):
+    with open(arpPath, 'w') as table:
+        for ipaddr, hwaddr in entries:
+            table.write('? (%s) at %s on en0 ifscope [ethernet]\n' % (ipaddr, hwaddr))
+
+    with open(procPath, 'w') as table:
+        table.write('IP address       HW type     Flags       HW address            Mask     Device\n')
+        for ipaddr, hwaddr in entries:
+            table.write('%-16s 0x1         0x2         %s     *        eth0\n' % (ipaddr, hwaddr))
+
+#-------------------------------------------------------------------------------
+# generate (ipaddr, hwaddr) entries for a neighbor table fixture
+def makeNeighbors(count):
+    entries = list()
+
+    for idx in range(count):
+        ipaddr = '10.%d.%d.%d' % ((idx >> 16) & 0xFF, (idx >> 8) & 0xFF, idx & 0xFF)
+        hwaddr = '02:00:00:%02x:%02x:%02x' % ((idx >> 16) & 0xFF, (idx >> 8) & 0xFF, idx & 0xFF)
+        entries.append((ipaddr, hwaddr))
+
+    return entries
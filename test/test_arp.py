@@ -0,0 +1,237 @@
+#!/usr/bin/env python2.7
+
+import os
+import time
+import logging
+import threading
+import unittest
+
+import arp
+import clients
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.ERROR)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+################################################################################
+# provides a fixed set of neighbor entries
+class StaticTable():
+
+    #---------------------------------------------------------------------------
+    def __init__(self, entries):
+        self.entries = entries
+
+    #---------------------------------------------------------------------------
+    def getNeighbors(self):
+        return iter(self.entries)
+
+################################################################################
+class ParseArpCommand(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_MacOSLine(self):
+        line = '? (10.0.0.1) at 0:11:22:33:44:55 on en0 ifscope [ethernet]'
+        self.assertEqual(arp.parseArpCommandLine(line), ('10.0.0.1', '0:11:22:33:44:55'))
+
+    #---------------------------------------------------------------------------
+    def test_LinuxLine(self):
+        line = '? (10.0.0.1) at 00:11:22:33:44:55 [ether] on eth0'
+        self.assertEqual(arp.parseArpCommandLine(line), ('10.0.0.1', '00:11:22:33:44:55'))
+
+    #---------------------------------------------------------------------------
+    def test_Incomplete(self):
+        self.assertIsNone(arp.parseArpCommandLine('? (10.0.0.5) at (incomplete) on en0'))
+        self.assertIsNone(arp.parseArpCommandLine('? (10.0.0.5) at <incomplete> on eth0'))
+
+    #---------------------------------------------------------------------------
+    def test_Garbage(self):
+        self.assertIsNone(arp.parseArpCommandLine(''))
+        self.assertIsNone(arp.parseArpCommandLine('at'))
+        self.assertIsNone(arp.parseArpCommandLine('arp: no entries'))
+
+    #---------------------------------------------------------------------------
+    def test_CommandOutput(self):
+        path = os.path.join(DATA_DIR, 'arp_macos.txt')
+        table = arp.ArpCommandTable(cmd=('/bin/cat', path))
+
+        hwaddrs = [ hwaddr for ipaddr, hwaddr in table.getNeighbors() ]
+        self.assertEqual(hwaddrs, ['0:11:22:33:44:55', 'aa:bb:cc:dd:ee:f', '1:0:5e:0:0:fb'])
+
+    #---------------------------------------------------------------------------
+    def test_MissingCommand(self):
+        table = arp.ArpCommandTable(cmd=('/does/not/exist',))
+        self.assertEqual(list(table.getNeighbors()), [ ])
+
+################################################################################
+class ParseProcArp(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_ProcTable(self):
+        table = arp.ProcArpTable(os.path.join(DATA_DIR, 'proc_net_arp'))
+
+        entries = list(table.getNeighbors())
+        self.assertEqual(entries, [
+            ('192.168.1.1', '00:11:22:33:44:55'),
+            ('192.168.1.30', 'aa:bb:cc:dd:ee:0f')
+        ])
+
+    #---------------------------------------------------------------------------
+    def test_MissingTable(self):
+        table = arp.ProcArpTable('/does/not/exist')
+        self.assertEqual(list(table.getNeighbors()), [ ])
+
+################################################################################
+class AddressFormat(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_ParseAddress(self):
+        self.assertEqual(arp.parseAddress('00:11:22:33:44:55'), 0x001122334455)
+        self.assertEqual(arp.parseAddress('0:11:22:33:44:5'), 0x001122334405)
+        self.assertEqual(arp.parseAddress('AA-BB-CC-DD-EE-FF'), 0xAABBCCDDEEFF)
+
+    #---------------------------------------------------------------------------
+    def test_InvalidAddress(self):
+        self.assertIsNone(arp.parseAddress(None))
+        self.assertIsNone(arp.parseAddress(''))
+        self.assertIsNone(arp.parseAddress('00:11:22:33:44'))
+        self.assertIsNone(arp.parseAddress('00:11:22:33:44:555'))
+        self.assertIsNone(arp.parseAddress('00:11:22:33:44:GG'))
+
+    #---------------------------------------------------------------------------
+    def test_FormatAddress(self):
+        self.assertEqual(arp.formatAddress(0x001122334405), '00:11:22:33:44:05')
+
+################################################################################
+class ArpCacheTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_NormalizedLookup(self):
+        path = os.path.join(DATA_DIR, 'arp_linux.txt')
+        source = arp.ArpCommandTable(cmd=('/bin/cat', path))
+
+        cache = arp.ArpCache(timeout=5, source=source)
+        cache.rebuildArpCache()
+
+        self.assertTrue(cache.isActive('00:11:22:33:44:55'))
+        self.assertTrue(cache.isActive('0:11:22:33:44:55'))
+        self.assertTrue(cache.isActive('AA:BB:CC:DD:EE:F'))
+        self.assertFalse(cache.isActive('00:00:00:00:00:00'))
+
+    #---------------------------------------------------------------------------
+    def test_InvalidAddress(self):
+        cache = arp.ArpCache(source=StaticTable([ ('10.0.0.1', 'not-a-mac') ]))
+        cache.rebuildArpCache()
+
+        self.assertFalse(cache.isActive('not-a-mac'))
+        self.assertFalse(cache.isActive(''))
+
+    #---------------------------------------------------------------------------
+    def test_IntegerLookup(self):
+        cache = arp.ArpCache(source=StaticTable([ ('10.0.0.1', '0:1:2:3:4:5') ]))
+        cache.rebuildArpCache()
+
+        self.assertTrue(cache.isActive(0x000102030405))
+        self.assertFalse(cache.isActive(0x000102030406))
+
+    #---------------------------------------------------------------------------
+    def test_Expiry(self):
+        source = StaticTable([ ('10.0.0.1', '00:00:00:00:00:01'), ('10.0.0.2', '00:00:00:00:00:02') ])
+
+        # 0.001 minutes is 60 milliseconds
+        cache = arp.ArpCache(timeout=0.001, source=source)
+        cache.rebuildArpCache()
+        self.assertEqual(len(cache.expiry), 2)
+
+        # keep one device fresh while the other goes stale
+        time.sleep(0.04)
+        source.entries = [ ('10.0.0.1', '00:00:00:00:00:01') ]
+        cache.rebuildArpCache()
+
+        time.sleep(0.04)
+        cache.purgeInactiveDevices()
+
+        self.assertTrue(cache.isActive('00:00:00:00:00:01'))
+        self.assertFalse(cache.isActive('00:00:00:00:00:02'))
+        self.assertEqual(len(cache.cache), 1)
+        self.assertEqual(len(cache.expiry), 1)
+
+    #---------------------------------------------------------------------------
+    def test_SnapshotIsReplaced(self):
+        source = StaticTable([ ('10.0.0.1', '00:00:00:00:00:01') ])
+
+        cache = arp.ArpCache(source=source)
+        cache.rebuildArpCache()
+        before = cache.getSnapshot()
+
+        source.entries = [ ('10.0.0.2', '00:00:00:00:00:02') ]
+        cache.rebuildArpCache()
+
+        # published tables are never modified in place
+        self.assertEqual(before.keys(), [ 0x01 ])
+        self.assertEqual(sorted(cache.getSnapshot().keys()), [ 0x01, 0x02 ])
+
+    #---------------------------------------------------------------------------
+    def test_ReadDuringRebuild(self):
+        started = threading.Event()
+        proceed = threading.Event()
+
+        def slowNeighbors():
+            yield ('10.0.0.2', '00:00:00:00:00:02')
+            started.set()
+            proceed.wait(5)
+
+        cache = arp.ArpCache(source=StaticTable([ ('10.0.0.1', '00:00:00:00:00:01') ]))
+        cache.rebuildArpCache()
+
+        cache.source.getNeighbors = slowNeighbors
+        rebuild = threading.Thread(target=cache.rebuildArpCache)
+        rebuild.start()
+        started.wait(5)
+
+        # readers see the old table while the rebuild is running
+        self.assertTrue(cache.isActive('00:00:00:00:00:01'))
+        self.assertFalse(cache.isActive('00:00:00:00:00:02'))
+
+        # a second rebuild does not wait for the first one
+        cache.rebuildArpCache()
+
+        proceed.set()
+        rebuild.join()
+
+        self.assertTrue(cache.isActive('00:00:00:00:00:02'))
+
+    #---------------------------------------------------------------------------
+    def test_MarkSeen(self):
+        cache = arp.ArpCache(timeout=0.001, source=StaticTable([ ('10.0.0.1', '00:00:00:00:00:01') ]))
+        cache.rebuildArpCache()
+
+        # new and expired addresses report an arrival, active ones do not
+        self.assertTrue(cache.markSeen('00:00:00:00:00:02'))
+        self.assertFalse(cache.markSeen(2))
+        self.assertTrue(cache.isActive('00:00:00:00:00:02'))
+
+        time.sleep(0.1)
+        self.assertFalse(cache.isActive(2))
+        self.assertTrue(cache.markSeen(2))
+
+        self.assertFalse(cache.markSeen('not-a-mac'))
+
+        # entries added this way still expire on the normal timeout
+        time.sleep(0.1)
+        cache.purgeInactiveDevices()
+        self.assertEqual(len(cache.getSnapshot()), 0)
+
+    #---------------------------------------------------------------------------
+    def test_ArpClientAge(self):
+        cache = arp.ArpCache(source=StaticTable([ ('10.0.0.1', '00:00:00:00:00:01') ]))
+        cache.rebuildArpCache()
+
+        client = clients.ArpClient('00:00:00:00:00:01', cache)
+        available, age = client.probe()
+
+        self.assertTrue(available)
+        self.assertLess(age, 1)
+
+        client = clients.ArpClient('00:00:00:00:00:02', cache)
+        self.assertEqual(client.probe(), (False, None))
@@ -1,22 +1,60 @@
 #!/usr/bin/env python2.7
 
+import os
+import time
 import logging
 import unittest
 
 import clients
+import icmp
+import probecache
+import standins
 
 # keep logging output to a minumim for testing
 logging.basicConfig(level=logging.ERROR)
 
 ################################################################################
-class CommonInternnetServices(unittest.TestCase):
+class LocalNetworkServices(unittest.TestCase):
 
     #---------------------------------------------------------------------------
-    def test_GoogleDNS(self):
-        client = clients.ServiceClient('8.8.8.8', 53)
+    def setUp(self):
+        self.listeners = standins.TcpListeners()
+
+    #---------------------------------------------------------------------------
+    def tearDown(self):
+        self.listeners.close()
+
+    #---------------------------------------------------------------------------
+    def test_ListeningPort(self):
+        client = clients.ServiceClient('127.0.0.1', self.listeners.ports[0])
         available = client.isAvailable()
         self.assertTrue(available)
 
+    #---------------------------------------------------------------------------
+    def test_ClosedPort(self):
+        client = clients.ServiceClient('127.0.0.1', standins.closedPort())
+        available = client.isAvailable()
+        self.assertFalse(available)
+
+    #---------------------------------------------------------------------------
+    def test_SharedProbe(self):
+        port = self.listeners.ports[0]
+        first = clients.ServiceClient('127.0.0.1', port)
+        second = clients.ServiceClient('127.0.0.1', port)
+
+        cache = probecache.ProbeCache()
+        first.probeCache = second.probeCache = cache
+
+        self.assertEqual(first.probe(), second.probe())
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 1)
+
+        # a different port is a different probe
+        other = clients.ServiceClient('127.0.0.1', standins.closedPort())
+        other.probeCache = cache
+        self.assertFalse(other.probe()[0])
+        self.assertEqual(cache.misses, 2)
+
 ################################################################################
 class NullClient(unittest.TestCase):
 
@@ -35,9 +73,35 @@ class BasicLocalCommands(unittest.TestCase):
         available = client.isAvailable()
         self.assertTrue(available)
 
+    #---------------------------------------------------------------------------
+    def test_CommandTime(self):
+        client = clients.LocalCommand('/bin/sleep 0.1')
+        available, latency = client.probe()
+
+        self.assertTrue(available)
+        self.assertGreaterEqual(latency, 0.1)
+
+    #---------------------------------------------------------------------------
+    def test_FailedCommandTime(self):
+        client = clients.LocalCommand('/bin/false')
+        available, latency = client.probe()
+
+        self.assertFalse(available)
+        self.assertIsNone(latency)
+
 ################################################################################
 class BasicPingTests(unittest.TestCase):
 
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.fake = standins.FakeCommands()
+        clients.PingClient.pingCommand = self.fake.ping
+
+    #---------------------------------------------------------------------------
+    def tearDown(self):
+        clients.PingClient.pingCommand = '/sbin/ping'
+        self.fake.close()
+
     #---------------------------------------------------------------------------
     def test_LocalPing(self):
         client = clients.PingClient('localhost')
@@ -50,18 +114,50 @@ class BasicPingTests(unittest.TestCase):
         available = client.isAvailable()
         self.assertFalse(available)
 
+    #---------------------------------------------------------------------------
+    def test_PingRoundTrip(self):
+        client = clients.PingClient('127.0.0.1')
+        self.assertEqual(client.probe(), (True, 0.042 / 1000))
+
+    #---------------------------------------------------------------------------
+    def test_SweeperResult(self):
+        sweeper = icmp.IcmpSweeper()
+        sweeper.results['192.0.2.1'] = None
+
+        client = clients.PingClient('192.0.2.1', sweeper)
+        available = client.isAvailable()
+        self.assertFalse(available)
+
+    #---------------------------------------------------------------------------
+    def test_SweeperRoundTrip(self):
+        sweeper = icmp.IcmpSweeper()
+        sweeper.results['192.0.2.1'] = 0.0125
+
+        client = clients.PingClient('192.0.2.1', sweeper)
+        self.assertEqual(client.probe(), (True, 0.0125))
+
 ################################################################################
 class HttpStatusChecks(unittest.TestCase):
 
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.server = standins.startHttpServer()
+        self.base = 'http://127.0.0.1:%d' % self.server.server_port
+
+    #---------------------------------------------------------------------------
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
     #---------------------------------------------------------------------------
     def test_Http200(self):
-        client = clients.HttpClient('https://httpstat.us/200')
+        client = clients.HttpClient(self.base + '/200')
         available = client.isAvailable()
         self.assertTrue(available)
 
     #---------------------------------------------------------------------------
     def test_Http301(self):
-        client = clients.HttpClient('https://httpstat.us/301')
+        client = clients.HttpClient(self.base + '/redirect')
         available = client.isAvailable()
 
         # the python client should process the redirect to a "success" status
@@ -69,13 +165,13 @@ class HttpStatusChecks(unittest.TestCase):
 
     #---------------------------------------------------------------------------
     def test_Http404(self):
-        client = clients.HttpClient('https://httpstat.us/404')
+        client = clients.HttpClient(self.base + '/404')
         available = client.isAvailable()
         self.assertFalse(available)
 
     #---------------------------------------------------------------------------
     def test_Http500(self):
-        client = clients.HttpClient('https://httpstat.us/500')
+        client = clients.HttpClient(self.base + '/500')
         available = client.isAvailable()
         self.assertFalse(available)
 
@@ -92,3 +188,83 @@ class LocalHostSSH(unittest.TestCase):
         available = self.client.isAvailable()
         self.assertTrue(available)
 
+
+################################################################################
+# uses a stand-in for ssh that records its arguments and runs no remote commands
+class SSHMultiplexing(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.fake = standins.FakeCommands()
+        self.fakeSSH = self.fake.ssh
+
+        self.log = os.path.join(self.fake.path, 'ssh.log')
+        open(self.log, 'w').close()
+        os.environ['FAKE_SSH_LOG'] = self.log
+
+        self.client = clients.SSHClient('host.example', port=2222, username='admin')
+        self.client.sshCommand = self.fakeSSH
+        self.client.commands['status'] = '/bin/true'
+
+    #---------------------------------------------------------------------------
+    def tearDown(self):
+        self.client.close()
+        self.fake.close()
+        del os.environ['FAKE_SSH_LOG']
+
+    #---------------------------------------------------------------------------
+    def getCommands(self):
+        with open(self.log) as log:
+            return [ line.split() for line in log ]
+
+    #---------------------------------------------------------------------------
+    def test_SharedMaster(self):
+        path = self.client.controlPath
+
+        self.assertTrue(self.client.isAvailable())
+        self.assertTrue(self.client.isAvailable())
+
+        # let the master process log its startup
+        time.sleep(0.2)
+
+        cmds = self.getCommands()
+        masters = [ cmd for cmd in cmds if cmd[0].startswith('-M') ]
+        remote = [ cmd for cmd in cmds if not cmd[0].startswith('-M') ]
+
+        self.assertEqual(len(masters), 1)
+        self.assertEqual(len(remote), 2)
+
+        for cmd in remote:
+            self.assertIn('ControlPath=%s' % path, cmd)
+            self.assertIn('BatchMode=yes', cmd)
+            self.assertEqual(cmd[-4:], ['-p', '2222', 'host.example', '/bin/true'])
+
+    #---------------------------------------------------------------------------
+    def test_ReapMaster(self):
+        other = clients.SSHClient('host.example', port=2222, username='admin')
+        self.assertEqual(other.controlPath, self.client.controlPath)
+
+        self.client.isAvailable()
+        proc = clients.SSHClient.masters[self.client.controlPath][0]
+
+        # the master stays up until the last client closes
+        other.close()
+        self.assertIsNone(proc.poll())
+
+        self.client.close()
+        self.assertIsNotNone(proc.poll())
+
+    #---------------------------------------------------------------------------
+    def test_DistinctHosts(self):
+        other = clients.SSHClient('host.example', port=22, username='admin')
+        self.assertNotEqual(other.controlPath, self.client.controlPath)
+        other.close()
+
+    #---------------------------------------------------------------------------
+    def test_NoMultiplexing(self):
+        client = clients.SSHClient('host.example', multiplex=False)
+        client.sshCommand = self.fakeSSH
+        client.commands['status'] = '/bin/true'
+
+        self.assertTrue(client.isAvailable())
+        self.assertNotIn('ControlPath', ' '.join(self.getCommands()[0]))
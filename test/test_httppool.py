@@ -0,0 +1,138 @@
+#!/usr/bin/env python2.7
+
+import os
+import ssl
+import shutil
+import logging
+import tempfile
+import unittest
+import subprocess
+
+import clients
+import httppool
+import standins
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.ERROR)
+
+################################################################################
+class HttpPoolTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.server = standins.startHttpServer()
+        self.base = 'http://127.0.0.1:%d' % self.server.server_port
+        self.pool = httppool.HttpConnectionPool(timeout=2)
+
+    #---------------------------------------------------------------------------
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    #---------------------------------------------------------------------------
+    def test_StatusCodes(self):
+        self.assertEqual(self.pool.request('GET', self.base + '/200'), 200)
+        self.assertEqual(self.pool.request('GET', self.base + '/404'), 404)
+        self.assertEqual(self.pool.request('GET', self.base + '/500'), 500)
+
+    #---------------------------------------------------------------------------
+    def test_KeepAlive(self):
+        for idx in range(10):
+            self.assertEqual(self.pool.request('GET', self.base + '/200'), 200)
+
+        self.assertEqual(self.pool.connectCount, 1)
+        self.assertEqual(self.server.connections, 1)
+
+    #---------------------------------------------------------------------------
+    def test_Head(self):
+        self.assertEqual(self.pool.request('HEAD', self.base + '/'), 204)
+        self.assertEqual(self.pool.request('HEAD', self.base + '/'), 204)
+        self.assertEqual(self.pool.connectCount, 1)
+
+    #---------------------------------------------------------------------------
+    def test_Redirect(self):
+        self.assertEqual(self.pool.request('GET', self.base + '/redirect'), 200)
+
+    #---------------------------------------------------------------------------
+    def test_RedirectLimit(self):
+        self.assertRaises(Exception, self.pool.request, 'GET', self.base + '/redirect', 0)
+        self.assertRaises(Exception, self.pool.request, 'GET', self.base + '/loop')
+
+    #---------------------------------------------------------------------------
+    def test_ServerClosedConnection(self):
+        self.assertEqual(self.pool.request('GET', self.base + '/200'), 200)
+
+        # drop the idle connection out from under the pool
+        for idle in self.pool.idle.values():
+            for conn, lastUsed in idle: conn.sock.close()
+
+        self.assertEqual(self.pool.request('GET', self.base + '/200'), 200)
+
+    #---------------------------------------------------------------------------
+    def test_TimeToFirstByte(self):
+        status, ttfb = self.pool.requestTimed('GET', self.base + '/redirect')
+
+        self.assertEqual(status, 200)
+        self.assertLess(ttfb, 1)
+
+    #---------------------------------------------------------------------------
+    def test_HttpClient(self):
+        client = clients.HttpClient(self.base + '/200', self.pool)
+        self.assertTrue(client.isAvailable())
+
+        client = clients.HttpClient(self.base + '/503', self.pool)
+        self.assertFalse(client.isAvailable())
+
+        client = clients.HttpClient(self.base + '/loop', self.pool)
+        self.assertFalse(client.isAvailable())
+
+################################################################################
+class HttpsPoolTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.cert = os.path.join(cls.tmpdir, 'cert.pem')
+
+        cmd = [ 'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                '-subj', '/CN=localhost', '-keyout', cls.cert, '-out', cls.cert ]
+
+        try:
+            with open(os.devnull, 'w') as devnull:
+                subprocess.check_call(cmd, stdout=devnull, stderr=devnull)
+        except (OSError, subprocess.CalledProcessError):
+            cls.cert = None
+
+    #---------------------------------------------------------------------------
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        if self.cert is None: self.skipTest('openssl not available')
+
+        serverContext = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        serverContext.load_cert_chain(self.cert)
+        self.server = standins.startHttpServer(serverContext)
+
+        clientContext = ssl.create_default_context(cafile=self.cert)
+        clientContext.check_hostname = False
+        self.pool = httppool.HttpConnectionPool(timeout=2, sslContext=clientContext)
+
+        self.base = 'https://127.0.0.1:%d' % self.server.server_port
+
+    #---------------------------------------------------------------------------
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    #---------------------------------------------------------------------------
+    def test_KeepAlive(self):
+        for idx in range(5):
+            self.assertEqual(self.pool.request('GET', self.base + '/200'), 200)
+
+        self.assertEqual(self.pool.connectCount, 1)
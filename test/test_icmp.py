@@ -0,0 +1,80 @@
+#!/usr/bin/env python2.7
+
+import logging
+import struct
+import unittest
+
+import icmp
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.ERROR)
+
+################################################################################
+class PacketFormatTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_Checksum(self):
+        packet = icmp.buildEchoRequest(0x1234, 1)
+        self.assertEqual(icmp.checksum(packet), 0)
+
+    #---------------------------------------------------------------------------
+    def test_ParseReply(self):
+        data = struct.pack('!BBHHH', icmp.ICMP_ECHO_REPLY, 0, 0, 42, 7)
+        self.assertEqual(icmp.parseEchoReply(data), (42, 7))
+
+    #---------------------------------------------------------------------------
+    def test_ParseReplyWithIpHeader(self):
+        header = '\x45' + ('\0' * 19)
+        data = struct.pack('!BBHHH', icmp.ICMP_ECHO_REPLY, 0, 0, 42, 7)
+        self.assertEqual(icmp.parseEchoReply(header + data), (42, 7))
+
+    #---------------------------------------------------------------------------
+    def test_IgnoreRequest(self):
+        packet = icmp.buildEchoRequest(42, 7)
+        self.assertIsNone(icmp.parseEchoReply(packet))
+
+    #---------------------------------------------------------------------------
+    def test_ShortPacket(self):
+        self.assertIsNone(icmp.parseEchoReply('\0\0\0'))
+
+################################################################################
+class SweeperTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.sweeper = icmp.IcmpSweeper(timeout=1)
+
+        if self.sweeper._openSocket() is None:
+            self.skipTest('ICMP sockets not available')
+
+    #---------------------------------------------------------------------------
+    def test_Localhost(self):
+        self.sweeper.register('localhost')
+        self.sweeper.register('127.0.0.1')
+
+        self.assertEqual(self.sweeper.sweep(), 2)
+        self.assertTrue(self.sweeper.getResult('localhost'))
+        self.assertTrue(self.sweeper.getResult('127.0.0.1'))
+        self.assertIsNotNone(self.sweeper.getRoundTripTime('localhost'))
+
+    #---------------------------------------------------------------------------
+    def test_UnknownHost(self):
+        self.sweeper.register('host.invalid')
+        self.sweeper.sweep()
+        self.assertFalse(self.sweeper.getResult('host.invalid'))
+
+    #---------------------------------------------------------------------------
+    def test_NotSwept(self):
+        self.assertIsNone(self.sweeper.getResult('localhost'))
+
+    #---------------------------------------------------------------------------
+    def test_Unregister(self):
+        self.sweeper.register('localhost')
+        self.sweeper.register('localhost')
+        self.sweeper.sweep()
+
+        self.sweeper.unregister('localhost')
+        self.assertTrue(self.sweeper.getResult('localhost'))
+
+        self.sweeper.unregister('localhost')
+        self.assertIsNone(self.sweeper.getResult('localhost'))
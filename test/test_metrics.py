@@ -0,0 +1,36 @@
+#!/usr/bin/env python2.7
+
+import unittest
+
+import metrics
+
+################################################################################
+class RollingWindowTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_Empty(self):
+        window = metrics.RollingWindow()
+
+        self.assertIsNone(window.last)
+        self.assertIsNone(window.getAverage())
+        self.assertIsNone(window.getPercentile(95))
+
+    #---------------------------------------------------------------------------
+    def test_Statistics(self):
+        window = metrics.RollingWindow(100)
+        for value in range(1, 101): window.add(value)
+
+        self.assertEqual(window.last, 100)
+        self.assertEqual(window.getAverage(), 50.5)
+        self.assertEqual(window.getPercentile(50), 50)
+        self.assertEqual(window.getPercentile(95), 95)
+        self.assertEqual(window.getPercentile(100), 100)
+
+    #---------------------------------------------------------------------------
+    def test_OldSamplesRollOff(self):
+        window = metrics.RollingWindow(4)
+        for value in [ 1000, 1000, 1, 2, 3, 4 ]: window.add(value)
+
+        self.assertEqual(window.count, 4)
+        self.assertEqual(window.getAverage(), 2.5)
+        self.assertEqual(window.getPercentile(95), 4)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python2.7
+
+import socket
+import struct
+import logging
+import unittest
+
+import arp
+import netlink
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.ERROR)
+
+#-------------------------------------------------------------------------------
+def buildAttribute(attrType, value):
+    length = netlink.RT_ATTRIBUTE.size + len(value)
+    attr = netlink.RT_ATTRIBUTE.pack(length, attrType) + value
+    return attr + '\0' * (netlink.align(length) - length)
+
+#-------------------------------------------------------------------------------
+def buildNeighborMessage(msgType, state, ipaddr=None, hwaddr=None):
+    body = netlink.ND_MESSAGE.pack(socket.AF_INET, 2, state, 0, 1)
+
+    if ipaddr is not None:
+        body += buildAttribute(netlink.NDA_DST, socket.inet_aton(ipaddr))
+
+    if hwaddr is not None:
+        octets = [ int(octet, 16) for octet in hwaddr.split(':') ]
+        body += buildAttribute(netlink.NDA_LLADDR, struct.pack('6B', *octets))
+
+    length = netlink.NLMSG_HEADER.size + len(body)
+    return netlink.NLMSG_HEADER.pack(length, msgType, 0, 0, 0) + body
+
+################################################################################
+class EmptyTable():
+
+    #---------------------------------------------------------------------------
+    def getNeighbors(self):
+        return [ ]
+
+################################################################################
+class ParseNeighborMessages(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_NewNeighbor(self):
+        data = buildNeighborMessage(netlink.RTM_NEWNEIGH, netlink.NUD_REACHABLE,
+                                    '192.168.0.10', '00:1b:63:84:45:e6')
+
+        messages = list(netlink.parseNeighborMessages(data))
+        self.assertEqual(messages, [
+            (netlink.RTM_NEWNEIGH, netlink.NUD_REACHABLE, '192.168.0.10', '00:1b:63:84:45:e6')
+        ])
+
+    #---------------------------------------------------------------------------
+    def test_MultipleMessages(self):
+        data = buildNeighborMessage(netlink.RTM_NEWNEIGH, netlink.NUD_INCOMPLETE, '10.0.0.1')
+        data += buildNeighborMessage(netlink.RTM_DELNEIGH, netlink.NUD_FAILED, '10.0.0.2')
+
+        messages = list(netlink.parseNeighborMessages(data))
+        self.assertEqual(messages, [
+            (netlink.RTM_NEWNEIGH, netlink.NUD_INCOMPLETE, '10.0.0.1', None),
+            (netlink.RTM_DELNEIGH, netlink.NUD_FAILED, '10.0.0.2', None)
+        ])
+
+    #---------------------------------------------------------------------------
+    def test_Truncated(self):
+        data = buildNeighborMessage(netlink.RTM_NEWNEIGH, netlink.NUD_REACHABLE,
+                                    '10.0.0.1', '00:00:00:00:00:01')
+
+        self.assertEqual(list(netlink.parseNeighborMessages(data[:-4])), [ ])
+        self.assertEqual(list(netlink.parseNeighborMessages('')), [ ])
+
+    #---------------------------------------------------------------------------
+    def test_OtherMessages(self):
+        data = netlink.NLMSG_HEADER.pack(netlink.NLMSG_HEADER.size, 3, 0, 0, 0)
+        self.assertEqual(list(netlink.parseNeighborMessages(data)), [ ])
+
+################################################################################
+class NeighborListenerTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.cache = arp.ArpCache(timeout=5, source=EmptyTable())
+        self.arrivals = list()
+        self.listener = netlink.NeighborListener(self.cache, self.arrivals.append)
+
+    #---------------------------------------------------------------------------
+    def test_Arrival(self):
+        self.listener._handleMessage(netlink.RTM_NEWNEIGH, netlink.NUD_REACHABLE,
+                                     '10.0.0.1', '00:00:00:00:00:01')
+
+        self.assertTrue(self.cache.isActive('00:00:00:00:00:01'))
+        self.assertEqual(self.arrivals, [ 1 ])
+
+        # devices that are already active are not reported again
+        self.listener._handleMessage(netlink.RTM_NEWNEIGH, netlink.NUD_REACHABLE,
+                                     '10.0.0.1', '00:00:00:00:00:01')
+        self.assertEqual(self.arrivals, [ 1 ])
+
+    #---------------------------------------------------------------------------
+    def test_UnconfirmedEntries(self):
+        for state in (netlink.NUD_STALE, netlink.NUD_DELAY, netlink.NUD_PROBE,
+                      netlink.NUD_PERMANENT):
+            self.listener._handleMessage(netlink.RTM_NEWNEIGH, state,
+                                         '10.0.0.1', '00:00:00:00:00:01')
+
+        self.listener._handleMessage(netlink.RTM_NEWNEIGH, netlink.NUD_REACHABLE, '10.0.0.2', None)
+
+        self.assertEqual(len(self.cache.getSnapshot()), 0)
+        self.assertEqual(self.arrivals, [ ])
+
+    #---------------------------------------------------------------------------
+    def test_RemovedEntriesAge(self):
+        self.listener._handleMessage(netlink.RTM_NEWNEIGH, netlink.NUD_REACHABLE,
+                                     '10.0.0.1', '00:00:00:00:00:01')
+        self.listener._handleMessage(netlink.RTM_DELNEIGH, netlink.NUD_STALE,
+                                     '10.0.0.1', '00:00:00:00:00:01')
+
+        # departures are left to the cache timeout
+        self.assertTrue(self.cache.isActive('00:00:00:00:00:01'))
+
+    #---------------------------------------------------------------------------
+    def test_StartStop(self):
+        if not netlink.NeighborListener.isSupported(): return
+        if not self.listener.start(): return
+
+        self.assertTrue(self.listener.running)
+        self.listener.stop()
+
+        self.assertFalse(self.listener.running)
+        self.assertIsNone(self.listener.sock)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python2.7
+
+import logging
+import threading
+import time
+import unittest
+
+import poller
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.ERROR)
+
+################################################################################
+class DevicePollerTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_AllItemsPolled(self):
+        seen = list()
+        lock = threading.Lock()
+
+        def probe(item):
+            with lock: seen.append(item)
+
+        dp = poller.DevicePoller(4)
+        dp.pollAll(range(25), probe)
+
+        self.assertEqual(sorted(seen), range(25))
+
+    #---------------------------------------------------------------------------
+    def test_CycleTimeIsSlowestProbe(self):
+        dp = poller.DevicePoller(10)
+        cycleTime = dp.pollAll(range(10), lambda item: time.sleep(0.2))
+
+        # sequential polling would take at least 2 seconds
+        self.assertLess(cycleTime, 1.0)
+        self.assertEqual(cycleTime, dp.lastCycleTime)
+
+    #---------------------------------------------------------------------------
+    def test_ConcurrencyLimit(self):
+        state = { 'active' : 0, 'peak' : 0 }
+        lock = threading.Lock()
+
+        def probe(item):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.05)
+            with lock:
+                state['active'] -= 1
+
+        dp = poller.DevicePoller(3)
+        dp.pollAll(range(12), probe)
+
+        self.assertEqual(state['peak'], 3)
+
+    #---------------------------------------------------------------------------
+    def test_FailingProbe(self):
+        seen = list()
+
+        def probe(item):
+            if item == 2: raise ValueError('bad device')
+            seen.append(item)
+
+        dp = poller.DevicePoller(1)
+        dp.pollAll(range(5), probe)
+
+        self.assertEqual(seen, [0, 1, 3, 4])
+
+    #---------------------------------------------------------------------------
+    def test_NoItems(self):
+        dp = poller.DevicePoller()
+        self.assertEqual(dp.pollAll([ ], None), 0.0)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python2.7
+
+import time
+import logging
+import unittest
+import threading
+
+import probecache
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.ERROR)
+
+################################################################################
+class ProbeCacheTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_SharedResult(self):
+        cache = probecache.ProbeCache(ttl=5)
+        calls = list()
+
+        def probe():
+            calls.append(1)
+            return (True, 0.01)
+
+        self.assertEqual(cache.get(('tcp', 'localhost', 22), probe), (True, 0.01))
+        self.assertEqual(cache.get(('tcp', 'localhost', 22), probe), (True, 0.01))
+        self.assertEqual(len(calls), 1)
+
+        # a different key gets its own probe
+        cache.get(('tcp', 'localhost', 80), probe)
+        self.assertEqual(len(calls), 2)
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+
+    #---------------------------------------------------------------------------
+    def test_Expiration(self):
+        cache = probecache.ProbeCache(ttl=0.05)
+        calls = list()
+
+        def probe():
+            calls.append(1)
+            return (len(calls) == 1, None)
+
+        self.assertEqual(cache.get('key', probe), (True, None))
+        time.sleep(0.1)
+        self.assertEqual(cache.get('key', probe), (False, None))
+        self.assertEqual(len(calls), 2)
+
+    #---------------------------------------------------------------------------
+    def test_Purge(self):
+        cache = probecache.ProbeCache(ttl=0.05)
+
+        cache.get('old', lambda: (True, None))
+        time.sleep(0.1)
+        cache.get('new', lambda: (True, None))
+
+        cache.purge()
+        self.assertEqual(cache.results.keys(), [ 'new' ])
+
+        cache.clear()
+        self.assertEqual(len(cache.results), 0)
+
+    #---------------------------------------------------------------------------
+    def test_ConcurrentProbesCoalesce(self):
+        cache = probecache.ProbeCache(ttl=5)
+        calls = list()
+        results = list()
+
+        def probe():
+            calls.append(1)
+            time.sleep(0.2)
+            return (True, 0.2)
+
+        def worker():
+            results.append(cache.get('nas', probe))
+
+        threads = [ threading.Thread(target=worker) for idx in range(8) ]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [ (True, 0.2) ] * 8)
+        self.assertEqual(cache.coalesced, 7)
+
+    #---------------------------------------------------------------------------
+    def test_FailedProbeIsNotShared(self):
+        cache = probecache.ProbeCache(ttl=5)
+
+        def broken():
+            raise IOError('probe failed')
+
+        self.assertRaises(IOError, cache.get, 'key', broken)
+        self.assertEqual(len(cache.inflight), 0)
+
+        # nothing was cached, so the next caller probes again
+        self.assertEqual(cache.get('key', lambda: (False, None)), (False, None))
+
@@ -0,0 +1,111 @@
+#!/usr/bin/env python2.7
+
+import time
+import logging
+import unittest
+
+import scheduler
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.ERROR)
+
+################################################################################
+class PollSchedulerTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.sched = scheduler.PollScheduler(maxBackoff=8, recheckDelay=10)
+
+    #---------------------------------------------------------------------------
+    def assertDelay(self, dueAt, delay):
+        self.assertAlmostEqual(dueAt - time.time(), delay, delta=1)
+
+    #---------------------------------------------------------------------------
+    def test_NewItemsAreDue(self):
+        self.sched.add('a', 60)
+        self.sched.add('b', 60, delay=30)
+
+        self.assertEqual(self.sched.getDueItems(), [ 'a' ])
+        self.assertEqual(self.sched.getDueItems(), [ ])
+        self.assertAlmostEqual(self.sched.getTimeUntilNext(), 30, delta=1)
+
+    #---------------------------------------------------------------------------
+    def test_DueOrder(self):
+        self.sched.add('late', 60, delay=-1)
+        self.sched.add('later', 60, delay=0)
+        self.sched.add('latest', 60, delay=-5)
+
+        self.assertEqual(self.sched.getDueItems(), [ 'latest', 'late', 'later' ])
+
+    #---------------------------------------------------------------------------
+    def test_ActiveInterval(self):
+        self.sched.add('a', 60)
+        self.sched.getDueItems()
+
+        self.assertDelay(self.sched.reschedule('a', True), 60)
+
+    #---------------------------------------------------------------------------
+    def test_RecheckAfterChange(self):
+        self.sched.add('a', 60)
+
+        self.sched.getDueItems()
+        self.sched.reschedule('a', True)
+
+        self.assertDelay(self.sched.reschedule('a', False), 10)
+
+    #---------------------------------------------------------------------------
+    def test_Backoff(self):
+        self.sched.add('a', 60)
+        self.sched.getDueItems()
+
+        delays = list()
+        for idx in range(7):
+            dueAt = self.sched.reschedule('a', False)
+            delays.append(int(round(dueAt - time.time())))
+
+            # force the item to be due again
+            self.sched.entries['a']['dueAt'] = None
+
+        self.assertEqual(delays, [ 60, 60, 120, 240, 480, 480, 480 ])
+
+        # coming back resets the backoff
+        self.assertDelay(self.sched.reschedule('a', True), 10)
+        self.sched.entries['a']['dueAt'] = None
+        self.assertDelay(self.sched.reschedule('a', False), 10)
+
+    #---------------------------------------------------------------------------
+    def test_Remove(self):
+        self.sched.add('a', 60)
+        self.sched.remove('a')
+
+        self.assertEqual(self.sched.getDueItems(), [ ])
+        self.assertIsNone(self.sched.getTimeUntilNext())
+        self.assertIsNone(self.sched.reschedule('a', True))
+
+    #---------------------------------------------------------------------------
+    def test_Overrun(self):
+        self.sched.add('a', 60, delay=-120)
+        self.sched.add('b', 60, delay=-30)
+
+        self.sched.getDueItems()
+        self.assertEqual(self.sched.overruns, 1)
+
+    #---------------------------------------------------------------------------
+    def test_KeepEarlierTime(self):
+        self.sched.add('a', 60, delay=5)
+
+        # a manual refresh should not push back the scheduled poll
+        self.assertDelay(self.sched.reschedule('a', True), 5)
+
+    #---------------------------------------------------------------------------
+    def test_Expedite(self):
+        self.sched.add('a', 60, delay=30)
+        self.assertEqual(self.sched.getDueItems(), [ ])
+
+        self.assertTrue(self.sched.expedite('a'))
+        self.assertEqual(self.sched.getDueItems(), [ 'a' ])
+
+        # items being polled are not queued twice
+        self.assertFalse(self.sched.expedite('a'))
+        self.assertFalse(self.sched.expedite('missing'))
+        self.assertEqual(self.sched.getDueItems(), [ ])
@@ -0,0 +1,93 @@
+#!/usr/bin/env python2.7
+
+import time
+import logging
+import unittest
+import threading
+
+import supervisor
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.CRITICAL)
+
+################################################################################
+class ProcessSupervisorTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.sup = supervisor.ProcessSupervisor(maxProcesses=4, timeout=5, maxOutput=16)
+
+    #---------------------------------------------------------------------------
+    def test_ExitStatus(self):
+        self.assertTrue(self.sup.run(['/bin/true']).isSuccess())
+
+        result = self.sup.run(['/bin/sh', '-c', 'exit 3'])
+        self.assertFalse(result.isSuccess())
+        self.assertEqual(result.returncode, 3)
+
+    #---------------------------------------------------------------------------
+    def test_CaptureOutput(self):
+        result = self.sup.run(['/bin/sh', '-c', 'echo out; echo err >&2'])
+
+        self.assertEqual(result.stdout, 'out\n')
+        self.assertEqual(result.stderr, 'err\n')
+
+    #---------------------------------------------------------------------------
+    def test_BoundedOutput(self):
+        result = self.sup.run(['/bin/sh', '-c', 'yes | head -c 1000000'])
+
+        self.assertTrue(result.isSuccess())
+        self.assertEqual(result.stdout, 'y\n' * 8)
+
+    #---------------------------------------------------------------------------
+    def test_Timeout(self):
+        result = self.sup.run(['/bin/sleep', '10'], timeout=0.2)
+
+        self.assertTrue(result.timedOut)
+        self.assertFalse(result.isSuccess())
+        self.assertLess(result.elapsed, 2)
+
+    #---------------------------------------------------------------------------
+    def test_KillProcessGroup(self):
+        # the background child keeps the pipes open after the shell exits
+        result = self.sup.run(['/bin/sh', '-c', 'sleep 10 & exit 0'], timeout=0.2)
+
+        self.assertTrue(result.timedOut)
+        self.assertLess(result.elapsed, 2)
+
+    #---------------------------------------------------------------------------
+    def test_MissingCommand(self):
+        result = self.sup.run(['/does/not/exist'])
+
+        self.assertFalse(result.isSuccess())
+        self.assertIsNone(result.returncode)
+
+    #---------------------------------------------------------------------------
+    def test_ConcurrencyLimit(self):
+        self.sup.maxProcesses = 2
+        peak = [ 0 ]
+
+        def run():
+            self.sup.run(['/bin/sleep', '0.2'])
+
+        def watch():
+            while any(thread.is_alive() for thread in threads):
+                peak[0] = max(peak[0], self.sup.running)
+                time.sleep(0.01)
+
+        threads = [ threading.Thread(target=run) for idx in range(6) ]
+        for thread in threads: thread.start()
+
+        watch()
+        self.assertEqual(peak[0], 2)
+
+    #---------------------------------------------------------------------------
+    def test_Concurrent(self):
+        threads = [ threading.Thread(target=self.sup.run, args=(['/bin/sleep', '0.3'],))
+                    for idx in range(4) ]
+
+        started = time.time()
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+
+        self.assertLess(time.time() - started, 1.0)
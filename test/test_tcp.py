@@ -0,0 +1,109 @@
+#!/usr/bin/env python2.7
+
+import logging
+import socket
+import unittest
+
+import tcp
+import clients
+
+# keep logging output to a minumim for testing
+logging.basicConfig(level=logging.ERROR)
+
+#-------------------------------------------------------------------------------
+def closedPort():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+################################################################################
+class ConnectProberTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.listeners = list()
+        self.prober = tcp.ConnectProber(timeout=1)
+
+    #---------------------------------------------------------------------------
+    def tearDown(self):
+        for sock in self.listeners: sock.close()
+
+    #---------------------------------------------------------------------------
+    def listen(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(128)
+        self.listeners.append(sock)
+        return sock.getsockname()[1]
+
+    #---------------------------------------------------------------------------
+    def test_OpenPort(self):
+        port = self.listen()
+        self.prober.register('127.0.0.1', port)
+
+        self.assertEqual(self.prober.sweep(), 1)
+        self.assertTrue(self.prober.getResult('127.0.0.1', port))
+        self.assertIsNotNone(self.prober.getConnectTime('127.0.0.1', port))
+
+    #---------------------------------------------------------------------------
+    def test_ClosedPort(self):
+        port = closedPort()
+        self.prober.register('127.0.0.1', port)
+
+        self.assertEqual(self.prober.sweep(), 0)
+        self.assertFalse(self.prober.getResult('127.0.0.1', port))
+
+    #---------------------------------------------------------------------------
+    def test_UnknownHost(self):
+        self.prober.register('host.invalid', 80)
+        self.prober.sweep()
+        self.assertFalse(self.prober.getResult('host.invalid', 80))
+
+    #---------------------------------------------------------------------------
+    def test_ManyTargets(self):
+        openPorts = [ self.listen() for idx in range(20) ]
+        closedPorts = [ closedPort() for idx in range(20) ]
+
+        for port in openPorts + closedPorts:
+            self.prober.register('localhost', port)
+
+        # use small batches to exercise the socket limit
+        self.prober.maxSockets = 7
+        self.assertEqual(self.prober.sweep(), 20)
+
+        for port in openPorts:
+            self.assertTrue(self.prober.getResult('localhost', port))
+
+        for port in closedPorts:
+            self.assertFalse(self.prober.getResult('localhost', port))
+
+    #---------------------------------------------------------------------------
+    def test_NotSwept(self):
+        self.assertIsNone(self.prober.getResult('localhost', 80))
+
+    #---------------------------------------------------------------------------
+    def test_ServiceClient(self):
+        port = self.listen()
+        self.prober.register('127.0.0.1', port)
+        self.prober.sweep()
+
+        client = clients.ServiceClient('127.0.0.1', port, self.prober)
+        available, latency = client.probe()
+
+        self.assertTrue(available)
+        self.assertEqual(latency, self.prober.getConnectTime('127.0.0.1', port))
+
+    #---------------------------------------------------------------------------
+    def test_SSHClientClosedPort(self):
+        port = closedPort()
+        self.prober.register('127.0.0.1', port)
+        self.prober.sweep()
+
+        # the status command should never run against a closed port
+        client = clients.SSHClient('127.0.0.1', port=port, prober=self.prober)
+        client.commands['status'] = '/bin/true'
+        client._rexec = None
+
+        self.assertFalse(client.isAvailable())